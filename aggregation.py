@@ -0,0 +1,180 @@
+"""
+Ensemble search over every non-empty subset of reasoning methods and several
+aggregators, with cross-validated selection:
+
+    python aggregation.py outputs/binary_experiment_results_<timestamp>.json
+"""
+import argparse
+import json
+
+import numpy as np
+
+from scoring import EPSILON, ForecastMatrix, brier_scores
+
+TRIM_FRACTION = 0.2
+EXTREMIZE_FACTORS = (1.25, 1.5, 2.0, 2.5)
+
+
+def subset_masks(n_methods: int) -> np.ndarray:
+    """Boolean (subsets x methods) matrix with one row per non-empty subset."""
+    codes = np.arange(1, 2 ** n_methods)
+    return ((codes[:, None] >> np.arange(n_methods)) & 1).astype(bool)
+
+
+def logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, EPSILON, 1 - EPSILON)
+    return np.log(p / (1 - p))
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+
+def masked_mean(values: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    """(questions x subsets) mean of the NaN-aware values over each subset."""
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (np.where(valid, values, 0.0) @ masks.T) / (valid.astype(float) @ masks.T)
+
+
+def masked_sorted(forecasts: np.ndarray, masks: np.ndarray):
+    """Each subset's forecasts sorted per question, NaN-padded: (questions x subsets x methods), counts."""
+    members = np.where(masks[None, :, :], forecasts[:, None, :], np.nan)
+    members.sort(axis=-1)  # NaNs sort last
+    return members, (~np.isnan(members)).sum(axis=-1)
+
+
+def aggregate_mean(forecasts, masks):
+    return masked_mean(forecasts, masks)
+
+
+def aggregate_median(forecasts, masks):
+    members, _ = masked_sorted(forecasts, masks)
+    with np.errstate(invalid="ignore"):
+        return np.nanmedian(members, axis=-1)
+
+
+def aggregate_trimmed_mean(forecasts, masks, trim: float = TRIM_FRACTION):
+    members, counts = masked_sorted(forecasts, masks)
+    cut = np.floor(counts * trim).astype(int)
+    position = np.arange(members.shape[-1])
+    keep = (position >= cut[..., None]) & (position < (counts - cut)[..., None])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(keep, np.nan_to_num(members), 0.0).sum(axis=-1) / keep.sum(axis=-1)
+
+
+def aggregate_geometric_mean_odds(forecasts, masks):
+    return sigmoid(masked_mean(logit(forecasts), masks))
+
+
+def aggregate_extremized(forecasts, masks, factor: float):
+    """Geometric mean of odds pushed away from 50% by `factor` in log-odds space."""
+    return sigmoid(factor * masked_mean(logit(forecasts), masks))
+
+
+AGGREGATORS = {
+    "mean": aggregate_mean,
+    "median": aggregate_median,
+    "trimmed_mean": aggregate_trimmed_mean,
+    "geometric_mean_odds": aggregate_geometric_mean_odds,
+}
+
+
+def candidate_forecasts(forecasts: np.ndarray, masks: np.ndarray, extremize_factors=EXTREMIZE_FACTORS):
+    """
+    Forecasts of every (aggregator, subset) candidate as one (questions x candidates)
+    array, with the list of (aggregator name, subset index) labels for its columns.
+    """
+    blocks = []
+    labels = []
+    for name, aggregator in AGGREGATORS.items():
+        blocks.append(aggregator(forecasts, masks))
+        labels += [(name, s) for s in range(len(masks))]
+    for factor in extremize_factors:
+        blocks.append(aggregate_extremized(forecasts, masks, factor))
+        labels += [(f"extremized_{factor:g}", s) for s in range(len(masks))]
+    return np.hstack(blocks), labels
+
+
+def cross_validate(briers: np.ndarray, n_folds: int = 5, seed: int = 0):
+    """
+    K-fold selection: for each fold, picks the candidate with the lowest mean
+    Brier on the other folds and scores it on the held-out fold only.
+    Returns (held-out Brier of the selection procedure, chosen candidate per fold).
+    """
+    n_questions = briers.shape[0]
+    folds = np.random.default_rng(seed).permutation(n_questions) % n_folds
+    one_hot = (folds[None, :] == np.arange(n_folds)[:, None]).astype(float)
+    valid = ~np.isnan(briers)
+    fold_sums = one_hot @ np.where(valid, briers, 0.0)
+    fold_counts = one_hot @ valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        train_means = (fold_sums.sum(axis=0) - fold_sums) / (fold_counts.sum(axis=0) - fold_counts)
+    train_means = np.where(np.isnan(train_means), np.inf, train_means)
+    chosen = train_means.argmin(axis=1)
+    held_out = fold_sums[np.arange(n_folds), chosen].sum() / fold_counts[np.arange(n_folds), chosen].sum()
+    return float(held_out), chosen
+
+
+def search(matrix: ForecastMatrix, n_folds: int = 5, top: int = 10, seed: int = 0):
+    masks = subset_masks(len(matrix.methods))
+    forecasts, labels = candidate_forecasts(matrix.forecasts, masks)
+    briers = brier_scores(forecasts, matrix.outcomes)
+    with np.errstate(invalid="ignore"):
+        mean_briers = np.nanmean(briers, axis=0)
+    order = np.argsort(np.where(np.isnan(mean_briers), np.inf, mean_briers))
+
+    def describe(c):
+        name, s = labels[c]
+        return {
+            "aggregator": name,
+            "methods": [m for m, keep in zip(matrix.methods, masks[s]) if keep],
+            "brier": float(mean_briers[c]),
+        }
+
+    cv_brier, chosen = cross_validate(briers, n_folds, seed)
+    # How often each method appears among the best subsets shows which prompts can be dropped
+    best_subsets = masks[[labels[c][1] for c in order[:top]]]
+    return {
+        "n_questions": len(matrix.question_ids),
+        "n_candidates": len(labels),
+        "full_mean_brier": float(mean_briers[labels.index(("mean", len(masks) - 1))]),
+        "top_in_sample": [describe(c) for c in order[:top]],
+        "cross_validated_brier": cv_brier,
+        "chosen_per_fold": [describe(c) for c in chosen],
+        "method_frequency_in_top": {
+            name: float(freq) for name, freq in zip(matrix.methods, best_subsets.mean(axis=0))
+        },
+    }
+
+
+def print_report(path, report: dict):
+    print(f"\n{path}: {report['n_questions']} questions, {report['n_candidates']} candidates")
+    print(f"Mean of all methods: {report['full_mean_brier']:.4f}")
+    print("\nBest in-sample (optimistic, fit and scored on the same questions):")
+    for rank, row in enumerate(report["top_in_sample"], 1):
+        print(f"{rank}. {row['brier']:.4f} {row['aggregator']}: {', '.join(row['methods'])}")
+    print(f"\nCross-validated Brier of picking the best candidate: {report['cross_validated_brier']:.4f}")
+    for fold, row in enumerate(report["chosen_per_fold"], 1):
+        print(f" - fold {fold}: {row['aggregator']}: {', '.join(row['methods'])}")
+    print("\nShare of top subsets that include each method:")
+    for name, freq in sorted(report["method_frequency_in_top"].items(), key=lambda x: -x[1]):
+        print(f" - {name}: {freq:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search ensemble subsets and aggregators over stored forecasts.")
+    parser.add_argument("paths", nargs="+", help="final .json reports, .jsonl results logs, .npz forecasts or result stores")
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--top", type=int, default=10, help="number of best candidates to report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = {}
+    for path in args.paths:
+        reports[path] = search(ForecastMatrix.load(path), args.folds, args.top, args.seed)
+        if not args.json:
+            print_report(path, reports[path])
+    if args.json:
+        print(json.dumps(reports, indent=2))
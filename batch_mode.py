@@ -0,0 +1,354 @@
+"""
+Offline backtests through a batch API instead of individual chat completions:
+
+    python batch_mode.py --transport openai [dataset filters]
+
+All filled prompts for the dataset are written to batch request files, each
+within the Batch API's request and size limits, submitted, polled until
+complete and joined back into the same per-question results that binary_main
+produces.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import pathlib
+import shutil
+import uuid
+
+import binary_test_system as bts
+from question_loader import load_questions
+from results_log import ResultsLog
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+MAX_BATCH_REQUESTS = 50000  # Batch API limits per input file
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+
+class OpenAIBatchTransport:
+    """Submits request files through the OpenAI Batch API."""
+
+    records_completions = True
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    async def submit(self, request_path) -> str:
+        with open(request_path, "rb") as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self.client.batches.retrieve(batch_id)
+        return batch.status
+
+    async def results(self, batch_id: str) -> list:
+        batch = await self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines += content.text.splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def canned_response(body: dict) -> str:
+    return "Probability: 50%"
+
+
+class LocalBatchTransport:
+    """
+    File-based stand-in for tests: each batch is a directory holding the input
+    file, answered line by line by `respond(request_body) -> str` on first poll.
+    Its answers are not real completions, so they are never recorded in the LLM cache.
+    """
+
+    records_completions = False
+
+    def __init__(self, directory, respond=canned_response):
+        self.directory = pathlib.Path(directory)
+        self.respond = respond
+
+    async def submit(self, request_path) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        batch_dir = self.directory / batch_id
+        batch_dir.mkdir(parents=True)
+        shutil.copy(request_path, batch_dir / "input.jsonl")
+        return batch_id
+
+    async def status(self, batch_id: str) -> str:
+        batch_dir = self.directory / batch_id
+        output_path = batch_dir / "output.jsonl"
+        if not output_path.exists():
+            with open(batch_dir / "input.jsonl", "r", encoding="utf-8") as src, \
+                    open(output_path, "w", encoding="utf-8") as out:
+                for line in src:
+                    request = json.loads(line)
+                    content = self.respond(request["body"])
+                    out.write(json.dumps({
+                        "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]},
+                        },
+                        "error": None,
+                    }) + "\n")
+        return "completed"
+
+    async def results(self, batch_id: str) -> list:
+        with open(self.directory / batch_id / "output.jsonl", "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def make_custom_id(question_id, reasoning_name: str) -> str:
+    return f"{question_id}::{reasoning_name}"
+
+
+def response_content(record: dict):
+    """The completion text of one batch output record, or None if the request failed."""
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        return None
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+async def prepare_questions(questions, limit: int):
+    """
+    Runs research for a stream of questions with at most `limit` in flight,
+    yielding prepared questions as they finish.
+    """
+    pending = set()
+    for question_details in questions:
+        pending.add(asyncio.ensure_future(bts.prepare_question(question_details)))
+        if len(pending) >= limit:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
+
+
+class RequestFiles:
+    """
+    Writes batch requests to requests_1.jsonl, requests_2.jsonl, ... in a
+    directory, starting a new file before one would exceed `max_requests`
+    lines or `max_bytes`.
+    """
+
+    def __init__(self, directory: pathlib.Path, max_requests: int = MAX_BATCH_REQUESTS, max_bytes: int = MAX_BATCH_BYTES):
+        self.directory = directory
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.names = []
+        self.f = None
+        self.requests = 0
+        self.bytes = 0
+
+    def write(self, request: dict):
+        line = (json.dumps(request) + "\n").encode("utf-8")
+        if len(line) > self.max_bytes:
+            raise ValueError(f"Batch request {request['custom_id']} alone is larger than {self.max_bytes} bytes")
+        if self.f is None or self.requests == self.max_requests or self.bytes + len(line) > self.max_bytes:
+            self.close()
+            self.names.append(f"requests_{len(self.names) + 1}.jsonl")
+            self.f = open(self.directory / self.names[-1], "wb")
+            self.requests = self.bytes = 0
+        self.f.write(line)
+        self.requests += 1
+        self.bytes += len(line)
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+async def write_batch_requests(questions, batch_dir: pathlib.Path, model: str, temperature: float) -> tuple:
+    """
+    Writes the prepared-question manifest and one batch request per (question,
+    method). Returns the number of questions and the request file names.
+    """
+    n_questions = 0
+    requests = RequestFiles(batch_dir)
+    try:
+        with open(batch_dir / "questions.jsonl", "w", encoding="utf-8") as manifest:
+            async for question_details in prepare_questions(questions, bts.RESEARCH_CONCURRENCY_LIMIT * 2):
+                manifest.write(json.dumps(question_details) + "\n")
+                if "research_error" in question_details:
+                    continue  # recorded as failed when the results are joined
+                for name, prompt in bts.BINARY_REASONING_PROMPTS:
+                    requests.write({
+                        "custom_id": make_custom_id(question_details["id"], name),
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": {
+                            "model": model,
+                            "messages": [{"role": "user", "content": bts.fill_prompt(question_details, prompt)}],
+                            "temperature": temperature,
+                        },
+                    })
+                n_questions += 1
+                print(f"Prepared Question {n_questions}: {question_details['title']}")
+    finally:
+        requests.close()
+    return n_questions, requests.names
+
+
+def join_results(batch_dir: pathlib.Path, records: list, results_log: ResultsLog, model: str, temperature: float):
+    """
+    Joins batch output back into per-question results. Completions are also
+    recorded in the LLM cache so later online or replay runs reuse them.
+    Failed or unparsable requests are recorded as missing methods.
+    Returns the number of missing (question, method) forecasts.
+    """
+    contents = {record["custom_id"]: response_content(record) for record in records}
+    n_missing = 0
+    with open(batch_dir / "questions.jsonl", "r", encoding="utf-8") as manifest:
+        for line in manifest:
+            question_details = json.loads(line)
+            if "research_error" in question_details:
+                names = [name for name, _ in bts.BINARY_REASONING_PROMPTS]
+                results_log.append(bts.research_failed_result(
+                    question_details, names, settings=bts.run_settings(model, temperature, samples=1)
+                ))
+                n_missing += len(names)
+                continue
+            results = []
+            for name, prompt in bts.BINARY_REASONING_PROMPTS:
+                filled_prompt = bts.fill_prompt(question_details, prompt)
+                response = contents.get(make_custom_id(question_details["id"], name))
+                if response is None:
+                    results.append((name, None, None, filled_prompt, "Batch request failed"))
+                    n_missing += 1
+                    continue
+                # One completion per request (batch mode does not sample), cached as call_llm would
+                bts.llm_cache.put(bts.llm_cache_key(filled_prompt, model, temperature), response)
+                try:
+                    probability = bts.extract_percentage_and_convert_to_decimal_from_response(response)
+                except ValueError as e:
+                    results.append((name, None, response, filled_prompt, f"Unparsable response: {e}"))
+                    n_missing += 1
+                    continue
+                results.append((name, probability, response, filled_prompt, None))
+            fingerprints = {name: bts.method_fingerprint(prompt, model, temperature) for name, prompt in bts.BINARY_REASONING_PROMPTS}
+            settings = bts.run_settings(model, temperature, samples=1)
+            results_log.append(bts.build_question_result(question_details, results, fingerprints, settings))
+    return n_missing
+
+
+async def batch_main(
+    transport,
+    dataset: str = bts.FILE,
+    question_filters: dict = None,
+    batch_dir: str = None,
+    model: str = bts.MODEL_NAME,
+    temperature: float = 0.3,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    research_cache_mode: str = "read_write",
+    llm_cache_mode: str = "record",
+):
+    bts.research_cache.mode = research_cache_mode
+    # The batch completions are recorded in the LLM cache, unless the transport's answers are not real ones
+    bts.llm_cache.mode = llm_cache_mode if transport.records_completions else "bypass"
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = pathlib.Path("outputs")
+    batch_dir = pathlib.Path(batch_dir) if batch_dir else output_dir / f"batch_{timestamp}"
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    state_path = batch_dir / "batch.json"
+
+    # Re-running with the same --batch-dir picks up the submitted batches instead of
+    # resubmitting, and submits any request files an interrupted run had not
+    if state_path.exists():
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if "batch_id" in state:  # written before requests were split over several batches
+            state = {**state, "request_files": ["requests.jsonl"], "batch_ids": [state.pop("batch_id")]}
+        print(f"Resuming {len(state['batch_ids'])} of {len(state['request_files'])} batches from {batch_dir}")
+    else:
+        questions = load_questions(dataset, **(question_filters or {}))
+        n_questions, request_files = await write_batch_requests(questions, batch_dir, model, temperature)
+        state = {
+            "request_files": request_files,
+            "batch_ids": [],
+            "model": model,
+            "temperature": temperature,
+            "timestamp": timestamp,
+        }
+        print(f"Prepared {n_questions} questions x {len(bts.BINARY_REASONING_PROMPTS)} methods "
+              f"in {len(request_files)} request files")
+    for request_file in state["request_files"][len(state["batch_ids"]):]:
+        state["batch_ids"].append(await transport.submit(batch_dir / request_file))
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        print(f"Submitted batch {state['batch_ids'][-1]} ({request_file})")
+
+    pending = list(state["batch_ids"])
+    failed = []
+    while pending:
+        statuses = dict(zip(pending, await asyncio.gather(*[transport.status(batch_id) for batch_id in pending])))
+        failed += [(batch_id, status) for batch_id, status in statuses.items() if status in ("failed", "expired", "cancelled")]
+        pending = [batch_id for batch_id, status in statuses.items() if status not in TERMINAL_STATUSES]
+        if pending:
+            print(f"{len(state['batch_ids']) - len(pending)} of {len(state['batch_ids'])} batches done; "
+                  + ", ".join(f"{batch_id}: {statuses[batch_id]}" for batch_id in pending))
+            await asyncio.sleep(poll_interval)
+    if failed:
+        raise RuntimeError(f"Batches ended without completing: {', '.join(f'{batch_id} ({status})' for batch_id, status in failed)}")
+
+    records = [record for batch_id in state["batch_ids"] for record in await transport.results(batch_id)]
+    results_log = ResultsLog(output_dir / f"binary_experiment_results_{state['timestamp']}.jsonl")
+    if results_log.path.exists():
+        results_log.path.unlink()  # the join is rebuilt from the batch output every time
+    with results_log:
+        n_missing = join_results(batch_dir, records, results_log, state["model"], state["temperature"])
+    if n_missing:
+        print(f"{n_missing} forecasts are missing because of failed research or failed or unparsable responses")
+
+    with open(batch_dir / "questions.jsonl", "r", encoding="utf-8") as manifest:
+        question_order = [json.loads(line)["id"] for line in manifest]
+    sorted_scores, mean_ensemble_brier = bts.write_final_report(
+        results_log, results_log.path.with_suffix(".json"), question_order
+    )
+    print("Saved experiment results as json.")
+    bts.print_final_summary(sorted_scores, mean_ensemble_brier)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the binary forecasting experiment through a batch API.")
+    parser.add_argument("--transport", choices=["openai", "local"], default="openai",
+                        help="openai submits to the Batch API; local answers with canned responses for tests")
+    parser.add_argument("--batch-dir",
+                        help="directory for the request files and batch state; reuse it to resume polling")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help="seconds between batch status checks")
+    bts.add_cache_arguments(parser)
+    bts.add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    if args.transport == "openai":
+        if bts.client is None:
+            parser.error("OPENAI_API_KEY is required for the openai transport")
+        transport = OpenAIBatchTransport(bts.client)
+    else:
+        transport = LocalBatchTransport(pathlib.Path("outputs") / "local_batches")
+
+    asyncio.run(batch_main(
+        transport,
+        dataset=args.file,
+        question_filters=bts.question_filters_from_args(args),
+        batch_dir=args.batch_dir,
+        poll_interval=args.poll_interval,
+        research_cache_mode=args.research_cache,
+        llm_cache_mode=args.llm_cache,
+    ))
@@ -0,0 +1,186 @@
+"""
+Throughput benchmark for binary_main against the local mock servers:
+
+    python benchmark.py --sizes 10 100 1000 10000 --save bench.json
+    python benchmark.py --baseline bench.json   # fails if wall time regresses
+
+Each size runs in a fresh subprocess, so peak memory is measured per run.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import pathlib
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_servers import add_mock_arguments, mock_config_from_args, start_mock_servers
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+REGRESSION_TOLERANCE = 0.2  # allowed relative slowdown against a baseline
+
+
+def write_synthetic_dataset(path, n_questions: int, seed: int = 0):
+    """Writes a JSON array of resolved binary questions shaped like the Metaculus dumps."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(n_questions):
+            question = {
+                "id": 100000 + i,
+                "title": f"Will synthetic event {i} happen before {2024 + i % 3}-12-31?",
+                "description": "Synthetic background text for benchmarking. " * 20,
+                "resolution_criteria": "Resolves Yes if the synthetic event happens.",
+                "fine_print": "Synthetic fine print.",
+                "open_time": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T00:00:00Z",
+                "resolution": rng.choice(["yes", "no"]),
+                "tags": ["synthetic"],
+            }
+            f.write(("  " if i == 0 else ",\n  ") + json.dumps(question))
+        f.write("\n]\n")
+
+
+def process_bytes_written() -> int:
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def run_one(n_questions: int, question_concurrency: int, call_concurrency: int) -> dict:
+    """Runs binary_main once in this process; the mock server URLs come from the environment."""
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="forecast_bench_"))
+    os.chdir(workdir)
+    write_synthetic_dataset(workdir / "questions.json", n_questions)
+
+    import binary_test_system as bts
+
+    bytes_before = process_bytes_written()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(bts.binary_main(
+            question_concurrency=question_concurrency,
+            call_concurrency=call_concurrency,
+            requests_per_minute=10_000_000,
+            tokens_per_minute=10_000_000_000,
+            research_cache_mode="off",
+            llm_cache_mode="bypass",
+            dataset=str(workdir / "questions.json"),
+        ))
+    wall = time.perf_counter() - started
+
+    outputs = list((workdir / "outputs").iterdir())
+    summary = bts.tracer.summary()
+    llm_calls = summary.get("llm", {}).get("calls", 0)
+    row = {
+        "questions": n_questions,
+        "wall_seconds": wall,
+        "llm_calls": llm_calls,
+        "calls_per_second": llm_calls / wall,
+        "llm_latency_p50": summary.get("llm", {}).get("latency", {}).get("p50"),
+        "llm_queue_wait_p95": summary.get("llm", {}).get("queue_wait", {}).get("p95"),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "output_mb": sum(path.stat().st_size for path in outputs) / 2 ** 20,
+        "bytes_written_mb": (process_bytes_written() - bytes_before) / 2 ** 20,
+    }
+    os.chdir(tempfile.gettempdir())
+    shutil.rmtree(workdir)
+    return row
+
+
+def run_sizes(sizes, args) -> list:
+    llm_server, research_server = start_mock_servers(mock_config_from_args(args))
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"{llm_server.base_url}/v1",
+        "PERPLEXITY_API_KEY": "mock",
+        "PERPLEXITY_BASE_URL": research_server.base_url,
+    }
+    here = pathlib.Path(__file__).resolve().parent
+    results = []
+    try:
+        for n in sizes:
+            completed = subprocess.run(
+                [
+                    sys.executable, str(here / "benchmark.py"), "--run-one", str(n),
+                    "--question-concurrency", str(args.question_concurrency),
+                    "--call-concurrency", str(args.call_concurrency),
+                ],
+                env={**env, "PYTHONPATH": str(here)},
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode != 0:
+                raise RuntimeError(f"Benchmark with {n} questions failed:\n{completed.stderr}")
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            print_row(results[-1])
+    finally:
+        llm_server.stop()
+        research_server.stop()
+    return results
+
+
+def print_header():
+    print(f"{'questions':>10}{'wall s':>10}{'calls':>9}{'calls/s':>10}{'p50 s':>8}{'peak MB':>10}{'out MB':>9}{'written MB':>12}")
+
+
+def print_row(row: dict):
+    print(
+        f"{row['questions']:>10}{row['wall_seconds']:>10.2f}{row['llm_calls']:>9}{row['calls_per_second']:>10.1f}"
+        f"{row['llm_latency_p50'] or 0:>8.3f}{row['peak_rss_mb']:>10.1f}{row['output_mb']:>9.2f}{row['bytes_written_mb']:>12.2f}"
+    )
+
+
+def check_regressions(results: list, baseline_path, tolerance: float) -> list:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {row["questions"]: row for row in json.load(f)}
+    failures = []
+    for row in results:
+        base = baseline.get(row["questions"])
+        if base is None:
+            continue
+        for key in ("wall_seconds", "peak_rss_mb", "bytes_written_mb"):
+            if base[key] and row[key] > base[key] * (1 + tolerance):
+                failures.append(f"{row['questions']} questions: {key} {row[key]:.2f} vs baseline {base[key]:.2f}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark binary_main against mock LLM and research servers.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="dataset sizes to run")
+    parser.add_argument("--question-concurrency", type=int, default=32)
+    parser.add_argument("--call-concurrency", type=int, default=128)
+    parser.add_argument("--save", metavar="JSON", help="write the results to this file")
+    parser.add_argument("--baseline", metavar="JSON", help="compare against saved results and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        print(json.dumps(run_one(args.run_one, args.question_concurrency, args.call_concurrency)))
+        sys.exit(0)
+
+    print_header()
+    results = run_sizes(args.sizes, args)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        failures = check_regressions(results, args.baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
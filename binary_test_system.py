@@ -1,14 +1,39 @@
+import argparse
 import asyncio
+import collections
 import datetime
 import json
 import os
 import re
+import time
 import dotenv
 import pathlib
-import requests
-from openai import AsyncOpenAI
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, BadRequestError, InternalServerError, RateLimitError
 import numpy as np
 
+from cache import CACHE_MODE_ALIASES, CACHE_MODES, CacheMiss, SQLiteCache
+from hedging import HEDGE_MAX_FRACTION, HEDGE_PERCENTILE, Hedger
+from instrumentation import Tracer, call_tags, tagged
+from question_loader import load_questions, parse_shard
+from racing import RACE_CONFIDENCE, RACE_MIN_QUESTIONS, MethodRace
+from rate_limiter import (
+    DEFAULT_REQUESTS_PER_MINUTE,
+    DEFAULT_TOKENS_PER_MINUTE,
+    AdaptiveRateLimiter,
+    backoff_delay,
+    estimate_tokens,
+)
+from research_index import (
+    REFRESH_MAX_AGE_DAYS,
+    REUSE_MAX_AGE_DAYS,
+    SIMILARITY_THRESHOLD,
+    ResearchIndex,
+    question_text,
+)
+from results_log import ResultsLog
+from results_store import ResultsStore
+from scheduler import SCHEDULE_AGING, CallScheduler
+from scoring import ForecastMatrix, brier_scores
 
 from reasoning_prompts import (
     FERMI_METHOD_PROMPT, 
@@ -27,6 +52,7 @@ dotenv.load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+PERPLEXITY_BASE_URL = os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")  # point at a local stub server for testing
 
 MODEL_NAME = "o3"
 FILE = "data/q4-2024_binary_resolved_metaculus_questions.json"
@@ -65,6 +91,14 @@ Today is {today}.
 The last thing you write is your final answer as: "Probability: ZZ%", 0-100
 """
 
+EXTRACTION_PROMPT_TEMPLATE = """
+Below is a forecaster's answer to a yes/no question. It should end with a final probability, but that could not be read automatically.
+
+{response}
+
+Reply with only the forecaster's final probability that the question resolves Yes, as: "Probability: ZZ%", 0-100
+"""
+
 #Original Metaculus Binary prompt beginning
 # 
 # # BINARY_PROMPT_TEMPLATE = """
@@ -86,14 +120,65 @@ The last thing you write is your final answer as: "Probability: ZZ%", 0-100
 # The last thing you write is your final answer as: "Probability: ZZ%", 0-100
 # """
 
+# Retries are handled in request_llm_completion so that 429s feed the rate limiter
 client = AsyncOpenAI(
         base_url=OPENAI_BASE_URL,
         api_key=OPENAI_API_KEY,
-        max_retries=2,
-    )
+        max_retries=0,
+    ) if OPENAI_API_KEY else None  # replay mode runs without a key
+
+CONCURRENT_REQUESTS_LIMIT = 9  # LLM calls in flight across all questions
+QUESTION_CONCURRENCY = 4  # questions in flight in the pipeline
+LLM_MAX_RETRIES = 6
+LLM_CALL_TIMEOUT_SECONDS = 900  # deadline for one LLM request, from when it is sent (queueing excluded)
+METHOD_MAX_ATTEMPTS = 2  # a failed or timed-out method is retried on its own
+EXTRACTION_MODEL = "gpt-4.1-mini"  # cheap follow-up when an answer has no parsable probability
+EXTRACTION_RESPONSE_CHARS = 8000
+ESTIMATED_COMPLETION_TOKENS = 4000  # reserved per call for the answer and reasoning tokens
+SAMPLES_PER_METHOD = 1  # completions per reasoning method; the forecast is their mean
+samples_per_method = SAMPLES_PER_METHOD
+n_unsupported_models = set()  # models that rejected or ignored `n`; sampled with separate calls
+llm_rate_limiter = AdaptiveRateLimiter(CONCURRENT_REQUESTS_LIMIT)
+tracer = Tracer()  # per-call timings, tokens, retries and errors
+hedger = Hedger()  # duplicates slow calls when enabled; off by default
+method_race = MethodRace([name for name, _ in BINARY_REASONING_PROMPTS])  # drops dominated methods when enabled
+call_scheduler = CallScheduler()  # longest-expected-first call order when enabled; FIFO otherwise
+# model -> (client, rate limiter) for models with their own endpoint and call pool,
+# as set up by model_sweep.py; other models go through `client` and `llm_rate_limiter`
+model_endpoints = {}
 
-CONCURRENT_REQUESTS_LIMIT = 9
-llm_rate_limiter = asyncio.Semaphore(CONCURRENT_REQUESTS_LIMIT)
+# Perplexity speaks the OpenAI chat completions protocol, so research goes through
+# its own pooled async client (connection reuse, timeouts, retries with exponential
+# backoff on 408/429/5xx) and its own concurrency limit, separate from the LLM calls.
+RESEARCH_CONCURRENCY_LIMIT = 3
+RESEARCH_TIMEOUT_SECONDS = 180
+RESEARCH_MAX_RETRIES = 4
+research_client = AsyncOpenAI(
+        base_url=PERPLEXITY_BASE_URL,
+        api_key=PERPLEXITY_API_KEY,
+        max_retries=RESEARCH_MAX_RETRIES,
+        timeout=RESEARCH_TIMEOUT_SECONDS,
+    ) if PERPLEXITY_API_KEY else None
+research_rate_limiter = asyncio.Semaphore(RESEARCH_CONCURRENCY_LIMIT)
+
+# Research is frozen at the search cutoff date, so it is cached on disk across runs
+RESEARCH_CACHE_PATH = "cache/research.sqlite"
+research_cache = SQLiteCache(RESEARCH_CACHE_PATH)
+
+# Near-duplicate questions can reuse each other's research (off unless enabled)
+RESEARCH_INDEX_PATH = "cache/research_index.sqlite"
+research_index = ResearchIndex(RESEARCH_INDEX_PATH)
+
+# Completions keyed by (model, temperature, filled prompt): record once, replay offline
+LLM_CACHE_PATH = "cache/llm.sqlite"
+LLM_CACHE_MAX_ENTRIES = None
+LLM_CACHE_MAX_AGE_SECONDS = None
+llm_cache = SQLiteCache(
+    LLM_CACHE_PATH,
+    mode="record",
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    max_age_seconds=LLM_CACHE_MAX_AGE_SECONDS,
+)
 
 
 def iso_to_mmddyyyy(iso_str: str) -> str:
@@ -106,66 +191,243 @@ def iso_to_mmddyyyy(iso_str: str) -> str:
     dt = datetime.datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
     return dt.strftime("%m/%d/%Y")
 
-def run_research(question: str, end_date_search: str) -> str:
+async def run_research(question: str, end_date_search: str) -> str:
     research = ""
-    if PERPLEXITY_API_KEY:
-        research = call_perplexity(question, end_date_search)
+    cache_key = SQLiteCache.make_key("sonar-pro", question, end_date_search)
+    cached = research_cache.get(cache_key)
+    if cached is not None:
+        research = cached
+    elif PERPLEXITY_API_KEY:
+        research = await call_perplexity(question, end_date_search)
+        research_cache.put(cache_key, research)
     else:
         research = "No research done"
 
     # print(f"########################\nResearch Found:\n{research}\n########################")
     return research
 
-def call_perplexity(question: str, end_date_search: str) -> str:
-    url = "https://api.perplexity.ai/chat/completions"
-    api_key = PERPLEXITY_API_KEY
-    headers = {
-        "accept": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "content-type": "application/json",
-    }
-    payload = {
-        "model": "sonar-pro",
-        "messages": [
-            {
-                "role": "system",  # this is a system prompt designed to guide the perplexity assistant
-                "content": """
+async def research_question(question_details: dict, end_date_search: str) -> str:
+    """
+    Research for one question. With research reuse enabled, a question without
+    cached research of its own takes the research of a similar question whose
+    search cutoff is on or before its own: as-is when that cutoff is recent,
+    otherwise extended by a search for news published since.
+    """
+    title = question_details["title"]
+    if not (research_index.enabled and research_cache.reads and research_client is not None):
+        return await run_research(title, end_date_search)
+    cache_key = SQLiteCache.make_key("sonar-pro", title, end_date_search)
+    cached = research_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    text = question_text(question_details)
+    match = research_index.match(question_details["id"], text, end_date_search)
+    if match is not None:
+        entry, action = match
+        try:
+            research = await research_cache.get_or_compute(
+                entry.research_key, lambda: call_perplexity(entry.title, entry.end_date)
+            )
+            if action == "reuse":
+                research_index.add(question_details["id"], entry.title, entry.end_date, entry.research_key, text)
+                research_index.reused += 1
+                return research
+            update = await call_perplexity(
+                RESEARCH_UPDATE_QUESTION.format(title=title, after=entry.end_date), end_date_search, entry.end_date
+            )
+        except Exception as e:
+            print(f"Reusing research of question {entry.question_id} failed ({type(e).__name__}: {e}); researching anew")
+        else:
+            research = RESEARCH_UPDATE_TEMPLATE.format(
+                research=research, after=entry.end_date, end=end_date_search, update=update
+            )
+            research_cache.put(cache_key, research)
+            research_index.add(question_details["id"], title, end_date_search, cache_key, text)
+            research_index.refreshed += 1
+            return research
+
+    # Indexed before the call, so similar questions in flight wait for this research
+    research_index.add(question_details["id"], title, end_date_search, cache_key, text)
+    try:
+        research = await research_cache.get_or_compute(cache_key, lambda: call_perplexity(title, end_date_search))
+    except BaseException:
+        research_index.discard(question_details["id"])
+        raise
+    research_index.fresh += 1
+    return research
+
+RESEARCH_UPDATE_QUESTION = "{title}\n\nOnly report news published after {after}; earlier background is already known."
+RESEARCH_UPDATE_TEMPLATE = "{research}\n\nUpdate covering {after} to {end}:\n{update}"
+
+PERPLEXITY_SYSTEM_PROMPT = """
                 You are an assistant to a superforecaster.
                 The superforecaster will give you a question they intend to forecast on.
                 To be a great assistant, you generate a concise but detailed rundown of the most relevant news, including if the question would resolve Yes or No based on current information.
                 You do not produce forecasts yourself.
-                """,
-            },
-            {
-                "role": "user",  # this is the actual prompt we ask the perplexity assistant to answer
-                "content": question,
-            },
-        ],
+                """
+
+async def call_perplexity(question: str, end_date_search: str, start_date_search: str = None) -> str:
+    """
+    Makes a non-blocking research request to Perplexity with concurrent request limiting.
+    """
+    search_filters = {
         "search_before_date_filter": end_date_search,
         "last_updated_before_filter": end_date_search,
     }
-    response = requests.post(url=url, json=payload, headers=headers)
-    if not response.ok:
-        raise Exception(response.text)
-    content = response.json()["choices"][0]["message"]["content"]
-    return content
+    if start_date_search is not None:
+        search_filters["search_after_date_filter"] = start_date_search
+    with tracer.call("research", model="sonar-pro") as call:
+        enqueued = time.perf_counter()
+        async with research_rate_limiter:
+            sent = time.perf_counter()
+            call.queue_wait = sent - enqueued
+            raw_response = await research_client.chat.completions.with_raw_response.create(
+                model="sonar-pro",
+                messages=[
+                    {
+                        "role": "system",  # this is a system prompt designed to guide the perplexity assistant
+                        "content": PERPLEXITY_SYSTEM_PROMPT,
+                    },
+                    {
+                        "role": "user",  # this is the actual prompt we ask the perplexity assistant to answer
+                        "content": question,
+                    },
+                ],
+                extra_body=search_filters,
+                stream=False,
+            )
+            call.latency = time.perf_counter() - sent
+        call.retries = getattr(raw_response, "retries_taken", 0)
+        response = raw_response.parse()
+        call.set_usage(response.usage)
+        content = response.choices[0].message.content
+        if content is None:
+            raise ValueError("No answer returned from Perplexity")
+        return content
 
 
 async def call_llm(prompt: str, model: str = MODEL_NAME, temperature: float = 0.3) -> str:
     """
-    Makes a streaming completion request to OpenAI's API with concurrent request limiting.
+    Returns the completion for the prompt, from the LLM cache when it has been recorded.
     """
-    async with llm_rate_limiter:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            stream=False,
-        )
-        answer = response.choices[0].message.content
-        if answer is None:
+    cache_key = llm_cache_key(prompt, model, temperature)
+    return await llm_cache.get_or_compute(
+        cache_key,
+        lambda: first_completion(hedger.run(
+            model, lambda on_sent: request_llm_completion(prompt, model, temperature, on_sent=on_sent)
+        )),
+    )
+
+async def first_completion(completions) -> str:
+    return next(answer for answer in await completions if answer is not None)
+
+def llm_cache_key(prompt: str, model: str, temperature: float, n: int = 1) -> str:
+    """The LLM cache key of `n` completions of the prompt; n is left out of a single completion's key."""
+    return SQLiteCache.make_key(model, temperature, prompt, *([n] if n > 1 else []))
+
+async def call_llm_samples(prompt: str, model: str = MODEL_NAME, temperature: float = 0.3, n: int = 1) -> list:
+    """
+    Returns `n` completions for the prompt, from the LLM cache when they have been recorded.
+    They are requested as `n` choices of one call, so the prompt is sent and billed once,
+    or as separate concurrent calls for models that do not support `n`.
+    """
+    if n == 1:
+        return [await call_llm(prompt, model, temperature)]
+    cache_key = llm_cache_key(prompt, model, temperature, n)
+    answers = await llm_cache.get_or_compute(cache_key, lambda: sample_llm_completions(prompt, model, temperature, n))
+    return json.loads(answers)
+
+async def sample_llm_completions(prompt: str, model: str, temperature: float, n: int) -> str:
+    choices = []
+    if model not in n_unsupported_models:
+        try:
+            choices = await hedger.run(
+                model, lambda on_sent: request_llm_completion(prompt, model, temperature, n, on_sent)
+            )
+        except BadRequestError as e:
+            if getattr(e, "param", None) != "n":
+                raise
+        # Judged on the choices returned, before empty ones are dropped: an empty
+        # choice is replaced below but says nothing about support for `n`
+        if len(choices) < n and model not in n_unsupported_models:
+            print(f"{model} returned {len(choices)} of {n} choices; sampling it with separate calls from now on")
+            n_unsupported_models.add(model)
+    answers = [answer for answer in choices if answer is not None]
+    extra = await asyncio.gather(*[
+        first_completion(hedger.run(
+            model, lambda on_sent: request_llm_completion(prompt, model, temperature, on_sent=on_sent)
+        ))
+        for _ in range(n - len(answers))
+    ])
+    return json.dumps(answers + extra)
+
+async def request_llm_completion(
+    prompt: str, model: str = MODEL_NAME, temperature: float = 0.3, n: int = 1, on_sent=None
+) -> list:
+    """
+    Makes a completion request to OpenAI's API through the adaptive rate limiter,
+    retrying rate limits, timeouts and server errors with jittered exponential backoff.
+    Returns the content of each choice, None for a choice without any, and
+    raises ValueError if none has content. `on_sent(sent)` is told when
+    each attempt is sent, and `on_sent(None)` when it is over (see Hedger.run).
+    """
+    model_client, rate_limiter = model_endpoints.get(model, (client, llm_rate_limiter))
+    if model_client is None:
+        raise ValueError(f"No API key is set for {model}; only replay mode can run without it")
+    prompt_tokens = estimate_tokens(prompt)
+    estimated_tokens = prompt_tokens + ESTIMATED_COMPLETION_TOKENS * n
+    tags = call_tags.get()
+    with tracer.call("llm", model=model, n=n) as call:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            call.retries = attempt
+            enqueued = time.perf_counter()
+            priority = call_scheduler.priority(model, tags.get("method"), tags.get("question_id"), prompt_tokens)
+            if tags.get("hedge"):
+                priority = float("-inf")  # a hedge only helps if it is sent while its primary is still slow
+            try:
+                async with rate_limiter.slot(estimated_tokens, priority):
+                    sent = time.perf_counter()
+                    call.queue_wait += sent - enqueued
+                    predicted = call_scheduler.dispatched(model, tags.get("method"), prompt_tokens)
+                    if on_sent is not None:
+                        on_sent(sent)
+                    try:
+                        raw_response = await asyncio.wait_for(
+                            model_client.chat.completions.with_raw_response.create(
+                                model=model,
+                                messages=[{"role": "user", "content": prompt}],
+                                temperature=temperature,
+                                stream=False,
+                                **({"n": n} if n > 1 else {}),
+                            ),
+                            LLM_CALL_TIMEOUT_SECONDS,
+                        )
+                    finally:
+                        call.latency += time.perf_counter() - sent
+                        if on_sent is not None:
+                            on_sent(None)
+                call_scheduler.finished(model, tags.get("method"), prompt_tokens, predicted, time.perf_counter() - sent)
+                break
+            except RateLimitError as e:
+                retry_after = rate_limiter.on_rate_limited(e.response.headers)
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(max(retry_after, backoff_delay(attempt)))
+            except (APITimeoutError, APIConnectionError, InternalServerError):
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+
+        rate_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        call.set_usage(response.usage)
+        if response.usage is not None:
+            rate_limiter.record_usage(estimated_tokens, response.usage.total_tokens)
+        answers = [choice.message.content for choice in response.choices]
+        if all(answer is None for answer in answers):
             raise ValueError("No answer returned from LLM")
-        return answer
+        return answers
     
 def extract_percentage_and_convert_to_decimal_from_response(
     forecast_text: str,
@@ -179,9 +441,18 @@ def extract_percentage_and_convert_to_decimal_from_response(
     else:
         raise ValueError(f"Could not extract prediction from response: {forecast_text}")
 
-async def run_reasoning_method(question_details: dict, reasoning_name: str, reasoning_prompt: str):
+def run_settings(model: str = MODEL_NAME, temperature: float = 0.3, samples: int = None) -> dict:
+    """The settings besides the prompts that a run's answers depend on, as recorded with each result."""
+    return {"model": model, "temperature": temperature, "samples": samples or samples_per_method}
 
-    filled_prompt = BINARY_PROMPT_TEMPLATE.format(
+def method_fingerprint(reasoning_prompt: str, model: str = MODEL_NAME, temperature: float = 0.3, samples: int = None) -> str:
+    """Identifies everything besides the question that determines a method's answer."""
+    samples = samples or samples_per_method
+    parts = (model, temperature, BINARY_PROMPT_TEMPLATE, reasoning_prompt) + ((samples,) if samples > 1 else ())
+    return SQLiteCache.make_key(*parts)
+
+def fill_prompt(question_details: dict, reasoning_prompt: str) -> str:
+    return BINARY_PROMPT_TEMPLATE.format(
         title=question_details["title"],
         today=question_details["today"],
         background=question_details["description"],
@@ -190,34 +461,139 @@ async def run_reasoning_method(question_details: dict, reasoning_name: str, reas
         summary_report=question_details["summary_report"],
         reasoning_prompt=reasoning_prompt
     )
-    response = await call_llm(filled_prompt)
-    probability = extract_percentage_and_convert_to_decimal_from_response(response)
-    return reasoning_name, probability, response, filled_prompt
 
-async def process_binary_question(question_details: dict):
-    resolution = question_details["resolution"].lower().strip()
-    ground_truth = 1 if resolution == "yes" else 0
+async def reextract_probability(response: str) -> float:
+    """Asks a cheap model to read the probability out of an answer, without rerunning the reasoning prompt."""
+    prompt = EXTRACTION_PROMPT_TEMPLATE.format(response=response[-EXTRACTION_RESPONSE_CHARS:])
+    answer = await call_llm(prompt, model=EXTRACTION_MODEL, temperature=0)
+    return extract_percentage_and_convert_to_decimal_from_response(answer)
 
+async def run_reasoning_method(
+    question_details: dict,
+    reasoning_name: str,
+    reasoning_prompt: str,
+    model: str = MODEL_NAME,
+    temperature: float = 0.3,
+    samples: int = None,
+):
+    """
+    Runs one method in isolation from the others. Returns
+    (name, probability, response, filled_prompt, note), where note is None,
+    "reextracted" if the probability came from the follow-up extraction call,
+    or the error if the method failed (probability is then None).
+    With several samples the probability is the mean over the samples that
+    could be read, and a list of {"probability", "response", "note"} dicts,
+    one per sample, is appended to the tuple.
+    """
+    samples = samples or samples_per_method
+    filled_prompt = fill_prompt(question_details, reasoning_prompt)
+    responses = None
+    error = None
+    with tagged(method=reasoning_name):
+        for attempt in range(METHOD_MAX_ATTEMPTS):
+            try:
+                responses = await call_llm_samples(filled_prompt, model, temperature, samples)
+                break
+            except CacheMiss as e:
+                error = f"CacheMiss: {e}"
+                break  # replay mode: retrying cannot help
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"{reasoning_name} ({model}) failed for question {question_details['id']} (attempt {attempt + 1}): {error}")
+        if responses is None:
+            return reasoning_name, None, None, filled_prompt, error
+        read = await asyncio.gather(*[read_probability(response) for response in responses])
+
+    if samples == 1:
+        probability, note = read[0]
+        return reasoning_name, probability, responses[0], filled_prompt, note
+    sample_results = [
+        {"probability": probability, "response": response, "note": note}
+        for response, (probability, note) in zip(responses, read)
+    ]
+    probabilities = [probability for probability, _ in read if probability is not None]
+    if not probabilities:
+        return reasoning_name, None, responses[0], filled_prompt, read[0][1], sample_results
+    note = "reextracted" if any(note == "reextracted" for _, note in read) else None
+    return reasoning_name, float(np.mean(probabilities)), responses[0], filled_prompt, note, sample_results
+
+async def read_probability(response: str):
+    """Returns (probability, note) for one answer, as described in run_reasoning_method."""
+    try:
+        return extract_percentage_and_convert_to_decimal_from_response(response), None
+    except ValueError:
+        try:
+            return await reextract_probability(response), "reextracted"
+        except Exception as e:
+            return None, f"Unparsable response: {type(e).__name__}: {e}"
+
+async def prepare_question(question_details: dict):
+    """
+    Adds the research summary and the research cutoff date used as "today".
+    If research fails, the summary is left empty and the error is added as
+    "research_error", so that only this question fails (see research_failed_result).
+    """
     end_date_used = iso_to_mmddyyyy(question_details["open_time"])
-    question_details["summary_report"] = run_research(question_details["title"], end_date_used)
     question_details["today"] = end_date_used
+    try:
+        with tagged(question_id=question_details["id"]):
+            question_details["summary_report"] = await research_question(question_details, end_date_used)
+    except Exception as e:
+        question_details["summary_report"] = ""
+        question_details["research_error"] = f"Research failed: {type(e).__name__}: {e}"
+        print(f"Research failed for question {question_details['id']}: {type(e).__name__}: {e}")
+    return question_details
+
+def research_failed_result(question_details: dict, method_names: list, fingerprints: dict = None, settings: dict = None) -> dict:
+    """The result of a question whose research failed: no method was run, all are missing with the error."""
+    error = question_details["research_error"]
+    results = [(name, None, None, None, error) for name in method_names]
+    return build_question_result(question_details, results, fingerprints, settings)
+
+def build_question_result(question_details: dict, results, fingerprints: dict = None, settings: dict = None) -> dict:
+    """
+    Scores the (name, probability, response, filled_prompt, note) results for one
+    question. Failed methods are left out of the ensemble and listed in missing_methods.
+    `fingerprints` (method name -> method_fingerprint) and `settings` (run_settings)
+    let incremental runs reuse results.
+    """
+    resolution = question_details["resolution"].lower().strip()
+    ground_truth = 1 if resolution == "yes" else 0
 
-    results = await asyncio.gather(
-        *[run_reasoning_method(question_details, name, prompt) for name, prompt in BINARY_REASONING_PROMPTS]
-    )
     individual_forecasts = {}
     individual_briers = {}
     responses = {}
     filled_prompts = {}
+    missing_methods = {}
+    reextracted_methods = []
+    sample_forecasts = {}
+    forecast_variance = {}
+    sample_responses = {}
 
-    for name, prob, response, filled_prompt in results:
+    for name, prob, response, filled_prompt, note, *samples in results:
+        if filled_prompt is not None:
+            filled_prompts[name] = filled_prompt
+        if response is not None:
+            responses[name] = response
+        if samples:
+            sample_forecasts[name] = [sample["probability"] for sample in samples[0]]
+            sample_responses[name] = [sample["response"] for sample in samples[0][1:]]
+            valid = [p for p in sample_forecasts[name] if p is not None]
+            forecast_variance[name] = float(np.var(valid, ddof=1)) if len(valid) > 1 else None
+        if prob is None:
+            missing_methods[name] = note
+            continue
+        if note == "reextracted":
+            reextracted_methods.append(name)
         individual_forecasts[name] = prob
         individual_briers[name] = (prob - ground_truth) ** 2
-        responses[name] = response
-        filled_prompts[name] = filled_prompt
     
-    ensemble_forecast = np.mean(list(individual_forecasts.values()))
-    ensemble_brier = (ensemble_forecast - ground_truth)**2
+    if individual_forecasts:
+        ensemble_forecast = np.mean(list(individual_forecasts.values()))
+        ensemble_brier = (ensemble_forecast - ground_truth)**2
+    else:
+        ensemble_forecast = None
+        ensemble_brier = None
     
     return {
         "question_id": question_details["id"],
@@ -228,79 +604,512 @@ async def process_binary_question(question_details: dict):
         "individual_brier_scores": individual_briers,
         "ensemble_forecast": ensemble_forecast,
         "ensemble_brier": ensemble_brier,
+        "missing_methods": missing_methods,
+        "reextracted_methods": reextracted_methods,
+        "sample_forecasts": sample_forecasts,
+        "forecast_variance": forecast_variance,
         "summary_report": question_details["summary_report"],
         "research_end_prompt_date": question_details["today"],
         "filled_prompts": filled_prompts,
-        "responses": responses
+        "responses": responses,
+        "sample_responses": sample_responses,
+        "method_fingerprints": fingerprints or {},
+        **({"settings": settings} if settings else {}),
     }
 
+def previous_method_result(previous: dict, name: str, filled_prompt: str) -> tuple:
+    """A method's forecast in a previous result, as the tuple run_reasoning_method returns."""
+    note = "reextracted" if name in previous.get("reextracted_methods", []) else None
+    result = (name, previous["individual_forecasts"][name], previous["responses"][name], filled_prompt, note)
+    probabilities = previous.get("sample_forecasts", {}).get(name)
+    if not probabilities:
+        return result
+    responses = [previous["responses"][name]] + previous.get("sample_responses", {}).get(name, [])
+    return result + ([
+        {"probability": probability, "response": response, "note": None}
+        for probability, response in zip(probabilities, responses)
+    ],)
 
-async def binary_main():
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+async def process_binary_question(question_details: dict):
+    # A resumed question that was logged with missing methods keeps its research
+    # and the methods that succeeded; a research failure is run again from scratch
+    previous = question_details.pop("previous_result", None)
+    if previous is not None and previous["filled_prompts"]:
+        question_details["summary_report"] = previous["summary_report"]
+        question_details["today"] = previous["research_end_prompt_date"]
+    else:
+        previous = None
+        await prepare_question(question_details)
 
-    output_dir = pathlib.Path("outputs")
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    with open(FILE, "r", encoding="utf-8") as f:
-        questions = json.load(f)
+    prompts = method_race.active_methods(BINARY_REASONING_PROMPTS)
+    if "research_error" in question_details:
+        return research_failed_result(question_details, [name for name, _ in prompts], settings=run_settings())
+    kept = {
+        name: previous_method_result(previous, name, previous["filled_prompts"][name])
+        for name, _ in BINARY_REASONING_PROMPTS
+        if previous is not None and name in previous["individual_forecasts"]
+    }
+    with tagged(question_id=question_details["id"]):
+        fresh = await asyncio.gather(
+            *[run_reasoning_method(question_details, name, prompt) for name, prompt in prompts if name not in kept]
+        )
+    fresh = {result[0]: result for result in fresh}
+    results = [kept.get(name) or fresh[name] for name, _ in BINARY_REASONING_PROMPTS if name in kept or name in fresh]
+    fingerprints = {name: method_fingerprint(prompt) for name, prompt in BINARY_REASONING_PROMPTS if name in kept or name in fresh}
+    return build_question_result(question_details, results, fingerprints, run_settings())
 
-    questions = [
-        q for q in questions
-        if q["resolution"].lower().strip() in ["yes", "no"] #to remove ambigious resolved questions
-    ]
-    # questions = questions[:20]
-    all_results = []
-    for i, question_details in enumerate(questions):
-        print(f"Processing Question {i+1} / {len(questions)}: {question_details['title']}")
-        result = await process_binary_question(question_details)
-        all_results.append(result)
-
-        # Save partial progress after each question (safety)
-        with open(output_dir/f"binary_experiment_results_{timestamp}.json", "w") as f:
-            json.dump(all_results, f, indent=2)
-
-        print(f"\nFinished Question {i+1}: '{result['title']}'")
-        for name, _ in BINARY_REASONING_PROMPTS:
+
+def print_question_result(result: dict, done: int):
+    print(f"\nFinished Question {done}: '{result['title']}'")
+    for name, _ in BINARY_REASONING_PROMPTS:
+        if name in result["individual_brier_scores"]:
             brier = result["individual_brier_scores"][name]
-            print(f" - {name}: Brier = {brier:.4f}")
+            variance = result.get("forecast_variance", {}).get(name)
+            spread = f" (sd {variance ** 0.5:.3f} over {len(result['sample_forecasts'][name])} samples)" if variance is not None else ""
+            print(f" - {name}: Brier = {brier:.4f}{spread}")
+        elif name in result["missing_methods"]:
+            print(f" - {name}: missing ({result['missing_methods'][name]})")
+        else:
+            print(f" - {name}: not run (eliminated)")
+    if result["ensemble_brier"] is not None:
         print(f"Ensemble Brier: {result['ensemble_brier']:.4f}")
-        print("-" * 40)
-
-    brier_sums = {name: 0.0 for name, _ in BINARY_REASONING_PROMPTS}
-    ensemble_brier_sum = 0.0
-    N = len(all_results)
-
-    for result in all_results:
-        for name, _ in BINARY_REASONING_PROMPTS:
-            brier_sums[name] += result["individual_brier_scores"][name]
-        ensemble_brier_sum += result["ensemble_brier"]
-
-    mean_brier_scores = {name: brier_sums[name] / N for name in brier_sums}
-    mean_ensemble_brier = ensemble_brier_sum / N
-
-    sorted_scores = sorted(mean_brier_scores.items(), key=lambda x: x[1])
-    ranked_brier_scores = [{"name": name, "score": score} for name, score in sorted_scores]
-
-    final_report = {
-        "prompt_template_used": BINARY_PROMPT_TEMPLATE,
-        "results": all_results,
-        "summary":{
-            "model": MODEL_NAME,
-            "ranked_mean_brier_scores": ranked_brier_scores,
-            "ensemble_mean_brier": mean_ensemble_brier
+    else:
+        print("Ensemble Brier: no methods succeeded")
+    print(f"Rate limiter: {llm_rate_limiter.describe()}")
+    print("-" * 40)
+
+async def run_question_pipeline(
+    questions,
+    on_result,
+    question_concurrency: int = QUESTION_CONCURRENCY,
+    process=process_binary_question,
+):
+    """
+    Bounded producer/consumer pipeline: keeps up to `question_concurrency`
+    questions in flight, while `llm_rate_limiter` bounds the LLM calls shared
+    between them. `questions` may be a lazy generator; it is only pulled from
+    as workers free up. `on_result(index, result)` is called as each question
+    finishes; `process(question_details)` produces its result.
+    """
+    queue = asyncio.Queue(maxsize=question_concurrency)
+
+    async def producer():
+        for i, question_details in enumerate(questions):
+            await queue.put((i, question_details))
+        for _ in range(question_concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, question_details = item
+            print(f"Processing Question {i+1}: {question_details['title']}")
+            result = await process(question_details)
+            on_result(i, result)
+
+    await asyncio.gather(producer(), *[worker() for _ in range(question_concurrency)])
+
+
+def mean_forecast_variance(results, method_names: list) -> dict:
+    """{"mean_forecast_variance": {method: mean sample variance}} for multi-sample runs, else {}."""
+    variances = {name: [] for name in method_names}
+    for result in results:
+        for name, variance in result["forecast_variance"].items():
+            if name in variances and variance is not None:
+                variances[name].append(variance)
+    if not any(variances.values()):
+        return {}
+    return {"mean_forecast_variance": {name: float(np.mean(v)) for name, v in variances.items() if v}}
+
+
+def write_final_report(
+    results_log: ResultsLog,
+    report_path,
+    question_order: list,
+    method_names: list = None,
+    models: list = None,
+    extra_summary: dict = None,
+):
+    """
+    Builds the final report by streaming the results log. Only byte offsets and
+    forecasts are held in memory; each result is copied from the log as-is,
+    in dataset order. The report of a results store holds only the summary, as
+    the store is itself the compact copy of the results (readers take its
+    directory). `method_names` defaults to BINARY_REASONING_PROMPTS; a model
+    sweep passes its "label/method" pairs and model settings instead.
+    """
+    offsets = {}
+    latest = {}
+    for offset, result in results_log.iter_offsets():
+        question_id = result["question_id"]
+        offsets[question_id] = offset  # a retried question keeps its latest record
+        latest[question_id] = {
+            "question_id": question_id,
+            "ground_truth": result["ground_truth"],
+            "individual_forecasts": result["individual_forecasts"],
+            "ensemble_brier": result["ensemble_brier"],
+            "forecast_variance": result.get("forecast_variance", {}),
+            "missing_methods": list(result["missing_methods"]),
         }
+
+    method_names = method_names or [name for name, _ in BINARY_REASONING_PROMPTS]
+    matrix = ForecastMatrix.from_results(latest.values(), methods=method_names)
+    briers = brier_scores(matrix.forecasts, matrix.outcomes)
+    forecast_counts = (~np.isnan(briers)).sum(axis=0)
+    mean_briers = np.nansum(briers, axis=0) / np.maximum(forecast_counts, 1)
+    # None for a method without a single forecast, ranked last
+    mean_brier_scores = {
+        name: float(mean_briers[j]) if forecast_counts[j] else None for j, name in enumerate(method_names)
+    }
+    # Missing: run but failed. Not run: never scheduled (eliminated by racing)
+    missing_counts = collections.Counter(name for r in latest.values() for name in r["missing_methods"])
+    not_run_counts = {
+        name: len(latest) - int(forecast_counts[j]) - missing_counts[name] for j, name in enumerate(method_names)
+    }
+    ensemble_briers = [r["ensemble_brier"] for r in latest.values() if r["ensemble_brier"] is not None]
+    mean_ensemble_brier = float(np.mean(ensemble_briers)) if ensemble_briers else None  # None if no method ever succeeded
+
+    sorted_scores = sorted(mean_brier_scores.items(), key=lambda x: (x[1] is None, x[1] or 0.0))
+    # Each mean is over the questions the method answered, which for a method
+    # eliminated by racing are fewer than for the others
+    questions = {name: int(forecast_counts[j]) for j, name in enumerate(method_names)}
+    ranked_brier_scores = [
+        {"name": name, "score": score, "questions": questions[name]} for name, score in sorted_scores
+    ]
+
+    summary = {
+        **({"models": models} if models else {"model": MODEL_NAME}),
+        "ranked_mean_brier_scores": ranked_brier_scores,
+        "ensemble_mean_brier": mean_ensemble_brier,
+        "missing_forecasts": {name: missing_counts[name] for name in method_names if missing_counts[name]},
+        **({"not_run": {name: n for name, n in not_run_counts.items() if n}} if any(not_run_counts.values()) else {}),
+        **mean_forecast_variance(latest.values(), method_names),
+        **(extra_summary or {}),
     }
 
-    with open(output_dir / f"binary_experiment_results_{timestamp}.json", "w") as f:
-        json.dump(final_report, f, indent=2)
+    position = {question_id: i for i, question_id in enumerate(question_order)}
+    ordered_ids = sorted(offsets, key=lambda question_id: position.get(question_id, len(position)))
+
+    with open(report_path, "w", encoding="utf-8") as out, open(results_log.path, "rb") as log_file:
+        out.write('{\n  "prompt_template_used": ' + json.dumps(BINARY_PROMPT_TEMPLATE) + ',')
+        if not isinstance(results_log, ResultsStore):
+            out.write('\n  "results": [')
+            for i, question_id in enumerate(ordered_ids):
+                log_file.seek(offsets[question_id])
+                out.write(("\n    " if i == 0 else ",\n    ") + log_file.readline().decode("utf-8").rstrip("\n"))
+            out.write('\n  ],')
+        out.write('\n  "summary": ')
+        out.write(json.dumps(summary, indent=2).replace("\n", "\n  "))
+        out.write("\n}\n")
+
+    return sorted_scores, mean_ensemble_brier
+
+
+def configure_run(
+    call_concurrency: int = CONCURRENT_REQUESTS_LIMIT,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+    research_cache_mode: str = "read_write",
+    llm_cache_mode: str = "record",
+    hedge: bool = False,
+    hedge_percentile: float = HEDGE_PERCENTILE,
+    hedge_budget: float = HEDGE_MAX_FRACTION,
+    race: bool = False,
+    race_confidence: float = RACE_CONFIDENCE,
+    race_min_questions: int = RACE_MIN_QUESTIONS,
+    samples: int = SAMPLES_PER_METHOD,
+    schedule: bool = False,
+    schedule_aging: float = SCHEDULE_AGING,
+    schedule_trace: str = None,
+    reuse_research: bool = False,
+    reuse_similarity: float = SIMILARITY_THRESHOLD,
+    reuse_max_age_days: int = REUSE_MAX_AGE_DAYS,
+    refresh_max_age_days: int = REFRESH_MAX_AGE_DAYS,
+):
+    """Sets up the call pool, caches, hedging, racing, sampling, scheduling and research reuse of a run."""
+    global llm_rate_limiter, hedger, method_race, samples_per_method, research_index, call_scheduler
+    samples_per_method = samples
+    llm_rate_limiter = AdaptiveRateLimiter(call_concurrency, requests_per_minute, tokens_per_minute)
+    hedger = Hedger(enabled=hedge, percentile=hedge_percentile, max_fraction=hedge_budget)
+    method_race = MethodRace(
+        [name for name, _ in BINARY_REASONING_PROMPTS],
+        enabled=race,
+        confidence=race_confidence,
+        min_questions=race_min_questions,
+    )
+    call_scheduler = CallScheduler(enabled=schedule, aging=schedule_aging)
+    if schedule and schedule_trace:
+        loaded = call_scheduler.latency_model.load_trace(schedule_trace)
+        print(f"Latency model warmed up from {loaded} calls in {schedule_trace}")
+    research_index = ResearchIndex(
+        RESEARCH_INDEX_PATH,
+        enabled=reuse_research,
+        threshold=reuse_similarity,
+        reuse_max_age_days=reuse_max_age_days,
+        refresh_max_age_days=refresh_max_age_days,
+    )
+    research_cache.mode = research_cache_mode
+    llm_cache.mode = llm_cache_mode
+
+
+async def run_questions(results_log, dataset: str, question_filters: dict, pipeline, print_result=print_question_result) -> list:
+    """
+    The run loop shared by the entry points. Questions already in `results_log`
+    are skipped, so an existing log is resumed, unless their latest result has
+    missing methods (failed research or calls): those are run again, with that
+    result as question_details["previous_result"] so that what succeeded can be
+    kept. The rest are streamed from the dataset through `pipeline(questions,
+    on_result)`, and each result is logged, printed with `print_result(result,
+    done)` and fed to the method race. Calls are traced next to the log.
+    Returns the dataset order of question IDs.
+    """
+    question_order = []
+    completed = {}  # question ID -> Brier scores, of the latest result of each finished question
+    retry = {}
+    for result in results_log.iter_results():
+        question_id = result["question_id"]
+        if result["missing_methods"]:
+            completed.pop(question_id, None)
+            retry[question_id] = result
+        else:
+            retry.pop(question_id, None)
+            completed[question_id] = {"individual_brier_scores": result["individual_brier_scores"]}
+    if isinstance(results_log, ResultsStore):
+        retry = {question_id: results_log.expand(record) for question_id, record in retry.items()}
+    if completed or retry:
+        print(f"Resuming from {results_log.path}: {len(completed)} questions already done, "
+              f"{len(retry)} to retry for failed research or methods")
+        if method_race.enabled:
+            for result in completed.values():
+                method_race.update(result)  # restores the race, including earlier eliminations
+
+    def pending_questions():
+        for q in load_questions(dataset, **(question_filters or {})):
+            question_order.append(q["id"])
+            if q["id"] in retry:
+                q["previous_result"] = retry.pop(q["id"])
+                yield q
+            elif q["id"] not in completed:
+                yield q
+
+    done = 0
+
+    def on_result(i: int, result: dict):
+        nonlocal done
+        results_log.append(result)
+        done += 1
+        print_result(result, done)
+        if method_race.enabled:
+            for name in method_race.update(result):
+                print(method_race.describe_elimination(name))
+
+    tracer.open(results_log.path.with_suffix(".trace.jsonl"))
+    try:
+        with results_log:
+            await pipeline(pending_questions(), on_result)
+    finally:
+        tracer.close()
+    return question_order
+
+
+def report_run(results_log, question_order: list):
+    """Writes the final report of a run next to its results log and prints the summary."""
+    extra_summary = None
+    if method_race.enabled:
+        extra_summary = {"eliminated_methods": {
+            name: {**info, "final_paired_comparison": method_race.paired_comparison(name)}
+            for name, info in method_race.eliminated.items()
+        }}
+    sorted_scores, mean_ensemble_brier = write_final_report(
+        results_log, results_log.path.with_suffix(".json"), question_order, extra_summary=extra_summary
+    )
+    if isinstance(results_log, ResultsStore):
+        results_log.write_forecasts([name for name, _ in BINARY_REASONING_PROMPTS])
     print("Saved experiment results as json.")
+    print_final_summary(sorted_scores, mean_ensemble_brier)
+
+
+async def binary_main(
+    question_concurrency: int = QUESTION_CONCURRENCY,
+    resume: str = None,
+    dataset: str = FILE,
+    question_filters: dict = None,
+    output: str = None,
+    compact: bool = False,
+    **settings,
+):
+    """Runs the experiment; `settings` are those of configure_run."""
+    configure_run(**settings)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    output_dir = pathlib.Path("outputs")
+    output_dir.mkdir(parents=True, exist_ok=True)
 
+    # Results are appended to a JSONL log as each question finishes; --resume
+    # continues an existing log and skips the questions already in it.
+    # A compact store keeps the log free of text and writes each text once.
+    shard = (question_filters or {}).get("shard")
+    if (resume or output) and pathlib.Path(resume or output).is_dir():
+        compact = True
+    log_class, suffix = (ResultsStore, ".store") if compact else (ResultsLog, ".jsonl")
+    if resume or output:
+        results_log = log_class(resume or output)
+    elif shard:
+        results_log = log_class(output_dir / f"binary_experiment_results_{timestamp}_shard-{shard[0]}-of-{shard[1]}{suffix}")
+    else:
+        results_log = log_class(output_dir / f"binary_experiment_results_{timestamp}{suffix}")
+
+    question_order = await run_questions(
+        results_log,
+        dataset,
+        question_filters,
+        lambda questions, on_result: run_question_pipeline(questions, on_result, question_concurrency),
+    )
+    report_run(results_log, question_order)
+
+def format_brier(score) -> str:
+    return "n/a" if score is None else f"{score:.4f}"
 
+def print_final_summary(sorted_scores: list, mean_ensemble_brier: float):
     print("\nMean Brier Scores (ranked):")
     for rank, (name, score) in enumerate(sorted_scores, 1):
-        print(f"{rank}. {name}: {score:.4f}")
+        basis = ""
+        if name in method_race.eliminated:
+            basis = f" (eliminated: over the {int(method_race.counts[method_race.column[name]])} questions it ran)"
+        print(f"{rank}. {name}: {format_brier(score)}{basis}")
+
+    print(f"\nEnsemble Mean Brier: {format_brier(mean_ensemble_brier)}")
+    print(f"Research cache: {research_cache.stats()}")
+    if research_index.enabled:
+        print(f"Research reuse: {research_index.describe()}")
+    print(f"LLM cache: {llm_cache.stats()}")
+    if hedger.enabled:
+        print(f"Hedging: {hedger.describe()}")
+    if call_scheduler.enabled:
+        call_scheduler.print_summary()
+    if method_race.enabled:
+        print(f"Racing: {method_race.describe()}")
+        for name in method_race.eliminated:
+            print(f" - {method_race.describe_elimination(name)}")
+            print(f"   at the end of the run, {method_race.describe_paired(name)}")
+    tracer.print_summary()
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--file", default=FILE,
+                        help="questions dataset, as a JSON array or JSONL")
+    parser.add_argument("--ids", type=lambda value: value.split(","),
+                        help="comma-separated question IDs to run")
+    parser.add_argument("--opened-after", metavar="DATE",
+                        help="only questions opened on or after this ISO date")
+    parser.add_argument("--opened-before", metavar="DATE",
+                        help="only questions opened before this ISO date")
+    parser.add_argument("--tags", type=lambda value: value.split(","),
+                        help="comma-separated tags; questions with any of them are run")
+    parser.add_argument("--shard", type=parse_shard, metavar="K/N",
+                        help="only run the k-th of n shards, partitioned by question ID")
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--research-cache", choices=CACHE_MODES, default="read_write",
+                        help="how research results are read from and written to the on-disk cache")
+    parser.add_argument("--llm-cache", choices=CACHE_MODES + tuple(CACHE_MODE_ALIASES), default="record",
+                        help="record (call the API, save completions), replay (offline, misses are errors), "
+                             "read_write (reuse recorded completions) or bypass")
+
+def question_filters_from_args(args) -> dict:
+    return {
+        "ids": args.ids,
+        "opened_after": args.opened_after,
+        "opened_before": args.opened_before,
+        "tags": args.tags,
+        "shard": args.shard,
+    }
+
+
+def add_run_arguments(parser: argparse.ArgumentParser):
+    """The configure_run settings, for entry points that run methods through the shared call pool."""
+    parser.add_argument("--call-concurrency", type=int, default=CONCURRENT_REQUESTS_LIMIT,
+                        help="number of LLM calls in flight at once, across all questions")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="starting requests/minute budget; adapts to the provider's rate limit headers")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TOKENS_PER_MINUTE,
+                        help="starting tokens/minute budget; adapts to the provider's rate limit headers")
+    parser.add_argument("--hedge", action="store_true",
+                        help="duplicate LLM calls that run past a learned latency percentile")
+    parser.add_argument("--hedge-percentile", type=float, default=HEDGE_PERCENTILE,
+                        help="latency percentile after which a call is hedged")
+    parser.add_argument("--hedge-budget", type=float, default=HEDGE_MAX_FRACTION,
+                        help="maximum hedged calls as a fraction of all calls")
+    parser.add_argument("--race", action="store_true",
+                        help="stop running methods that are statistically worse than the current best")
+    parser.add_argument("--race-confidence", type=float, default=RACE_CONFIDENCE,
+                        help="confidence required to eliminate a method")
+    parser.add_argument("--race-min-questions", type=int, default=RACE_MIN_QUESTIONS,
+                        help="questions a method must share with the best before it can be eliminated")
+    parser.add_argument("--samples", type=int, default=SAMPLES_PER_METHOD,
+                        help="completions per method, requested as n choices of one call where the API supports it")
+    parser.add_argument("--schedule", action="store_true",
+                        help="let waiting LLM calls in longest-expected-latency first, using latencies learned during the run")
+    parser.add_argument("--schedule-aging", type=float, default=SCHEDULE_AGING,
+                        help="seconds of priority a question's calls gain per second it has been running")
+    parser.add_argument("--schedule-trace", metavar="TRACE_JSONL",
+                        help="warm up the latency model from the .trace.jsonl of an earlier run")
+    parser.add_argument("--reuse-research", action="store_true",
+                        help="reuse the cached research of near-duplicate questions with the same or an earlier search cutoff")
+    parser.add_argument("--reuse-similarity", type=float, default=SIMILARITY_THRESHOLD,
+                        help="estimated Jaccard similarity of title and description needed to reuse research")
+    parser.add_argument("--reuse-max-age-days", type=int, default=REUSE_MAX_AGE_DAYS,
+                        help="reuse research as-is when its cutoff is at most this many days earlier")
+    parser.add_argument("--refresh-max-age-days", type=int, default=REFRESH_MAX_AGE_DAYS,
+                        help="up to this age, reuse research plus a search for news since its cutoff")
+
+def run_settings_from_args(args) -> dict:
+    """configure_run keyword arguments from add_run_arguments and the cache arguments."""
+    return {
+        "call_concurrency": args.call_concurrency,
+        "requests_per_minute": args.rpm,
+        "tokens_per_minute": args.tpm,
+        "research_cache_mode": args.research_cache,
+        "llm_cache_mode": args.llm_cache,
+        "hedge": args.hedge,
+        "hedge_percentile": args.hedge_percentile,
+        "hedge_budget": args.hedge_budget,
+        "race": args.race,
+        "race_confidence": args.race_confidence,
+        "race_min_questions": args.race_min_questions,
+        "samples": args.samples,
+        "schedule": args.schedule,
+        "schedule_aging": args.schedule_aging,
+        "schedule_trace": args.schedule_trace,
+        "reuse_research": args.reuse_research,
+        "reuse_similarity": args.reuse_similarity,
+        "reuse_max_age_days": args.reuse_max_age_days,
+        "refresh_max_age_days": args.refresh_max_age_days,
+    }
 
-    print(f"\nEnsemble Mean Brier: {mean_ensemble_brier:.4f}")
 
 if __name__ == "__main__":
-    asyncio.run(binary_main())
+    parser = argparse.ArgumentParser(description="Run the binary forecasting experiment.")
+    parser.add_argument("--question-concurrency", type=int, default=QUESTION_CONCURRENCY,
+                        help="number of questions in flight at once")
+    parser.add_argument("--resume", metavar="RESULTS_JSONL",
+                        help="continue an interrupted run, skipping questions already in its results log")
+    parser.add_argument("--output", metavar="RESULTS_JSONL",
+                        help="write the results log here instead of a timestamped file; an existing log is resumed")
+    parser.add_argument("--compact", action="store_true",
+                        help="write a deduplicated results store directory (text stored once, forecasts as .npz)")
+    add_run_arguments(parser)
+    add_cache_arguments(parser)
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(binary_main(
+        question_concurrency=args.question_concurrency,
+        resume=args.resume,
+        dataset=args.file,
+        question_filters=question_filters_from_args(args),
+        output=args.output,
+        compact=args.compact,
+        **run_settings_from_args(args),
+    ))
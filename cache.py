@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import pathlib
+import sqlite3
+import time
+
+# read_write: read-through and write-through (the default)
+# refresh:    always call the API and overwrite what is cached
+# cache_only: never call the API; a miss is an error (offline reruns)
+# off:        bypass the cache entirely
+CACHE_MODES = ("read_write", "refresh", "cache_only", "off")
+# record / replay / bypass naming used for LLM completions. Recording calls the
+# API every time, so a rerun draws fresh samples instead of silently replaying
+# old ones; read_write reuses recorded completions on purpose.
+CACHE_MODE_ALIASES = {"record": "refresh", "replay": "cache_only", "bypass": "off"}
+
+
+# Shard workers on one host share the cache files; wait out each other's writes
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+class ComputeCancelled(RuntimeError):
+    """Raised to callers sharing a computation whose owner was cancelled."""
+
+
+class SQLiteCache:
+    """
+    Content-addressed key/value store for API responses, kept in a single SQLite file.
+    Keys are the sha256 of the JSON-encoded inputs that determine the response.
+
+    Optional eviction drops entries older than `max_age_seconds` and keeps at most
+    `max_entries` of the most recent ones.
+    """
+
+    def __init__(self, path: str, mode: str = "read_write", max_entries: int = None, max_age_seconds: float = None):
+        self.path = pathlib.Path(path)
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._in_flight = {}
+        self._puts_since_evict = 0
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode: str):
+        mode = CACHE_MODE_ALIASES.get(mode, mode)
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self._mode = mode
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in ("read_write", "cache_only")
+
+    @property
+    def writes(self) -> bool:
+        return self.mode in ("read_write", "refresh")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)")
+            self.evict()
+        return self._conn
+
+    def get(self, key: str):
+        """
+        Returns the cached value, or None if it should be fetched.
+        Raises CacheMiss in cache_only mode when the key is not cached.
+        """
+        if not self.reads:
+            return None
+        row = self._connect().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            return row[0]
+        self.misses += 1
+        if self.mode == "cache_only":
+            raise CacheMiss(f"{key} not found in {self.path} (cache_only mode)")
+        return None
+
+    def put(self, key: str, value: str):
+        if not self.writes:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+        self._puts_since_evict += 1
+        if self.max_entries is not None and self._puts_since_evict >= max(1, self.max_entries // 10):
+            self.evict()
+
+    def evict(self):
+        """Applies the size/age eviction policy, if any."""
+        self._puts_since_evict = 0
+        if self.max_age_seconds is None and self.max_entries is None:
+            return
+        conn = self._connect()
+        with conn:
+            if self.max_age_seconds is not None:
+                conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            if self.max_entries is not None:
+                conn.execute(
+                    "DELETE FROM entries WHERE key NOT IN "
+                    "(SELECT key FROM entries ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    async def get_or_compute(self, key: str, compute):
+        """
+        Returns the cached value for `key`, or awaits `compute()` and caches its result.
+        Concurrent callers asking for the same key share a single `compute()` call;
+        if the caller running it is cancelled, the others get ComputeCancelled.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # The waiters were not cancelled themselves: fail them instead
+            future.set_exception(ComputeCancelled(f"computing {key} was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved so it isn't logged when nobody else is waiting
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.mode} mode, {self.path})"
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
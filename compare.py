@@ -0,0 +1,411 @@
+"""
+Cross-run comparison over a small SQLite index of experiment outputs:
+
+    python compare.py index [outputs/ or result files ...]
+    python compare.py runs
+    python compare.py delta RUN_A RUN_B [--methods FERMI_METHOD,TIPPING]
+    python compare.py disagree RUN_A RUN_B [--method ENSEMBLE --top 20]
+
+The index keeps run metadata and one row per (run, question, method)
+forecast. Each file is streamed once, without loading it whole, and files
+whose size and modification time are unchanged are skipped on the next
+update. Scanning a directory picks up its .json reports; results logs and
+results stores can be indexed by path. A run is given by its index ID or by
+its file path (indexed on the spot if needed); queries index new files in
+outputs/ first.
+
+`delta` compares mean Brier scores per method on the questions both runs
+answered, with a paired sign-flip permutation test (p-values also Holm-adjusted
+across the methods compared). `disagree` lists the questions where the two
+runs' forecasts differ most.
+"""
+import argparse
+import json
+import os
+import pathlib
+import sqlite3
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from question_loader import iter_json_array
+from scoring import ENSEMBLE, RESULTS_FILE
+
+INDEX_PATH = "outputs/compare_index.sqlite"
+OUTPUT_DIR = "outputs"
+PERMUTATION_RESAMPLES = 10000
+PERMUTATION_MAX_QUESTIONS = 200  # larger samples use the normal limit of the permutation distribution
+DISAGREEMENTS_SHOWN = 20
+
+
+def stream_results(path, metadata: dict):
+    """
+    Streams the results of a .json report, a plain JSON list, a .jsonl results
+    log or a results store. A report's other top-level values (its summary)
+    are put into `metadata`; for a store, from the summary-only report beside its records.
+    """
+    path = pathlib.Path(path)
+    if path.is_dir():
+        path = path / RESULTS_FILE
+        report_path = path.with_suffix(".json")
+        if report_path.exists():
+            with open(report_path, "r", encoding="utf-8") as f:
+                metadata["summary"] = json.load(f).get("summary", {})
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        # A report's summary follows its results, so it is only in `metadata` once they are all read
+        yield from iter_json_array(f, key="results", members=metadata)
+
+
+class CompareIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                questions INTEGER,  -- NULL for files that hold no results
+                methods TEXT,
+                model TEXT,
+                summary TEXT
+            );
+            CREATE TABLE IF NOT EXISTS outcomes (
+                run_id INTEGER NOT NULL,
+                question_id TEXT NOT NULL,
+                outcome REAL,
+                PRIMARY KEY (run_id, question_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS forecasts (
+                run_id INTEGER NOT NULL,
+                method TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                forecast REAL NOT NULL,
+                PRIMARY KEY (run_id, method, question_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS titles (question_id TEXT PRIMARY KEY, title TEXT);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, paths) -> list:
+        """Indexes new and changed result files; directories are scanned for .json reports."""
+        files = []
+        for path in paths:
+            path = pathlib.Path(path)
+            if path.is_dir() and not (path / RESULTS_FILE).exists():
+                files += sorted(p for p in path.glob("*.json"))
+            else:
+                files.append(path)
+        indexed = []
+        for path in files:
+            if self.index_file(path):
+                indexed.append(path)
+        return indexed
+
+    def index_file(self, path) -> bool:
+        """Indexes one file unless it is indexed already and unchanged; returns whether it was read."""
+        path = pathlib.Path(path).resolve()
+        stat = (path / RESULTS_FILE if path.is_dir() else path).stat()
+        row = self.conn.execute("SELECT run_id, size, mtime FROM runs WHERE path = ?", (str(path),)).fetchone()
+        if row is not None and (row[1], row[2]) == (stat.st_size, stat.st_mtime):
+            return False
+        metadata = {}
+        with self.conn:
+            if row is None:
+                run_id = self.conn.execute(
+                    "INSERT INTO runs (path, size, mtime) VALUES (?, ?, ?)", (str(path), stat.st_size, stat.st_mtime)
+                ).lastrowid
+            else:  # changed since it was indexed (e.g. a resumed run): reindexed under the same ID
+                run_id = row[0]
+                self.conn.execute(
+                    "UPDATE runs SET size = ?, mtime = ?, questions = NULL WHERE run_id = ?",
+                    (stat.st_size, stat.st_mtime, run_id),
+                )
+                self.conn.execute("DELETE FROM outcomes WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM forecasts WHERE run_id = ?", (run_id,))
+            latest = {}
+            try:
+                for result in stream_results(path, metadata):
+                    if not isinstance(result, dict) or "individual_forecasts" not in result:
+                        raise ValueError("not a results file")
+                    latest[json.dumps(result["question_id"])] = (
+                        result.get("ground_truth"), result.get("title"), result["individual_forecasts"]
+                    )  # a retried question keeps its latest record
+            except (ValueError, KeyError) as e:
+                print(f"Skipping {path}: {e}")
+                return True  # recorded with no results, so it is not read again
+            methods = {}
+            for question_id, (outcome, title, forecasts) in latest.items():
+                self.conn.execute("INSERT INTO outcomes VALUES (?, ?, ?)", (run_id, question_id, outcome))
+                if title is not None:
+                    self.conn.execute("INSERT OR REPLACE INTO titles VALUES (?, ?)", (question_id, title))
+                for method, forecast in forecasts.items():
+                    methods.setdefault(method, None)
+                self.conn.executemany(
+                    "INSERT INTO forecasts VALUES (?, ?, ?, ?)",
+                    [(run_id, method, question_id, forecast) for method, forecast in forecasts.items() if forecast is not None],
+                )
+            summary = metadata.get("summary", {})
+            model = summary.get("model") or ",".join(m["label"] for m in summary.get("models", []))
+            self.conn.execute(
+                "UPDATE runs SET questions = ?, methods = ?, model = ?, summary = ? WHERE run_id = ?",
+                (len(latest), json.dumps(list(methods)), model or None, json.dumps(summary), run_id),
+            )
+        return True
+
+    def resolve(self, run) -> int:
+        """A run ID, or a file path (indexed first if needed)."""
+        if str(run).isdigit():
+            row = self.conn.execute("SELECT run_id FROM runs WHERE run_id = ? AND questions IS NOT NULL", (int(run),)).fetchone()
+        else:
+            if not os.path.exists(run):
+                raise ValueError(f"No run {run}: not an index ID or a file")
+            self.index_file(run)
+            row = self.conn.execute(
+                "SELECT run_id FROM runs WHERE path = ? AND questions IS NOT NULL", (str(pathlib.Path(run).resolve()),)
+            ).fetchone()
+        if row is None:
+            raise ValueError(f"No indexed results for run {run}")
+        return row[0]
+
+    def runs(self) -> list:
+        rows = self.conn.execute(
+            "SELECT run_id, path, questions, methods, model, summary FROM runs WHERE questions IS NOT NULL ORDER BY run_id"
+        ).fetchall()
+        return [
+            {
+                "run_id": run_id,
+                "path": path,
+                "questions": questions,
+                "methods": len(json.loads(methods)),
+                "model": model,
+                "ensemble_mean_brier": json.loads(summary).get("ensemble_mean_brier"),
+            }
+            for run_id, path, questions, methods, model, summary in rows
+        ]
+
+    def run_path(self, run_id: int) -> str:
+        return self.conn.execute("SELECT path FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+    def load(self, run_id: int) -> tuple:
+        """Returns (question_ids, methods, forecasts (questions x methods, NaN if missing), outcomes)."""
+        outcomes = dict(self.conn.execute("SELECT question_id, outcome FROM outcomes WHERE run_id = ?", (run_id,)))
+        methods = json.loads(self.conn.execute("SELECT methods FROM runs WHERE run_id = ?", (run_id,)).fetchone()[0])
+        question_ids = list(outcomes)
+        row = {question_id: i for i, question_id in enumerate(question_ids)}
+        column = {method: j for j, method in enumerate(methods)}
+        forecasts = np.full((len(question_ids), len(methods)), np.nan)
+        for method, question_id, forecast in self.conn.execute(
+            "SELECT method, question_id, forecast FROM forecasts WHERE run_id = ?", (run_id,)
+        ):
+            forecasts[row[question_id], column[method]] = forecast
+        outcome_array = np.array([np.nan if y is None else y for y in outcomes.values()], dtype=float)
+        return question_ids, methods, forecasts, outcome_array
+
+    def titles(self, question_ids: list) -> dict:
+        placeholders = ",".join("?" * len(question_ids))
+        return dict(self.conn.execute(f"SELECT question_id, title FROM titles WHERE question_id IN ({placeholders})", question_ids))
+
+
+def with_ensemble(methods: list, forecasts: np.ndarray) -> tuple:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # questions with no forecasts at all
+        ensemble = np.nanmean(forecasts, axis=1, keepdims=True)
+    return methods + [ENSEMBLE], np.hstack([forecasts, ensemble])
+
+
+def paired(index: CompareIndex, run_a: int, run_b: int) -> tuple:
+    """Forecasts of both runs on their shared questions, for the methods both have (plus ENSEMBLE)."""
+    ids_a, methods_a, forecasts_a, outcomes_a = index.load(run_a)
+    ids_b, methods_b, forecasts_b, outcomes_b = index.load(run_b)
+    methods_a, forecasts_a = with_ensemble(methods_a, forecasts_a)
+    methods_b, forecasts_b = with_ensemble(methods_b, forecasts_b)
+    row_b = {question_id: i for i, question_id in enumerate(ids_b)}
+    shared = [(i, row_b[question_id]) for i, question_id in enumerate(ids_a) if question_id in row_b]
+    rows_a = np.array([i for i, _ in shared], dtype=int)
+    rows_b = np.array([j for _, j in shared], dtype=int)
+    outcomes = outcomes_a[rows_a]
+    conflicting = ~np.isnan(outcomes) & (outcomes != outcomes_b[rows_b])
+    if conflicting.any():
+        print(f"Warning: {int(conflicting.sum())} shared questions resolve differently in the two runs; skipped")
+        outcomes = np.where(conflicting, np.nan, outcomes)
+    methods = [method for method in methods_a if method in methods_b]
+    a = forecasts_a[rows_a][:, [methods_a.index(method) for method in methods]]
+    b = forecasts_b[rows_b][:, [methods_b.index(method) for method in methods]]
+    return [ids_a[i] for i in rows_a], methods, a, b, outcomes
+
+
+def permutation_p_values(differences: list, n_resamples: int = PERMUTATION_RESAMPLES, seed: int = 0) -> list:
+    """
+    Two-sided paired sign-flip permutation test of mean difference 0, for each
+    array of differences. Over PERMUTATION_MAX_QUESTIONS pairs the permutation
+    distribution of the sum, with mean 0 and variance sum(d^2), is taken as normal.
+    """
+    rng = np.random.default_rng(seed)
+    p_values = []
+    for d in differences:
+        if len(d) == 0:
+            p_values.append(float("nan"))
+            continue
+        observed = abs(d.mean())
+        if len(d) > PERMUTATION_MAX_QUESTIONS:
+            spread = np.sqrt((d ** 2).sum())
+            p_values.append(1.0 if spread == 0 else 2 * (1 - statistics.NormalDist().cdf(observed * len(d) / spread)))
+            continue
+        extreme = 0
+        for start in range(0, n_resamples, 1000):
+            # sum(sign * d) with random signs, as 2 * (the d with a + sign) - sum(d)
+            flips = rng.random((min(1000, n_resamples - start), len(d)), dtype=np.float32) < 0.5
+            sums = 2 * (flips.astype(np.float64) @ d) - d.sum()
+            extreme += int((np.abs(sums) / len(d) >= observed - 1e-12).sum())
+        p_values.append((extreme + 1) / (n_resamples + 1))
+    return p_values
+
+
+def holm(p_values: list) -> list:
+    """Holm-Bonferroni adjusted p-values. NaN p-values (no paired forecasts) stay NaN and are not counted as tests."""
+    order = sorted((i for i, p in enumerate(p_values) if not np.isnan(p)), key=lambda i: p_values[i])
+    adjusted = [float("nan")] * len(p_values)
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, min(1.0, (len(order) - rank) * p_values[i]))
+        adjusted[i] = running
+    return adjusted
+
+
+def brier_deltas(index: CompareIndex, run_a: int, run_b: int, methods: list = None, n_resamples: int = PERMUTATION_RESAMPLES) -> list:
+    """Per method: mean Brier of each run on the questions both answered, B - A, and paired test p-values."""
+    _, shared_methods, a, b, outcomes = paired(index, run_a, run_b)
+    selected = [j for j, method in enumerate(shared_methods) if methods is None or method in methods]
+    rows, differences = [], []
+    for j in selected:
+        both = ~np.isnan(a[:, j]) & ~np.isnan(b[:, j]) & ~np.isnan(outcomes)
+        brier_a = (a[both, j] - outcomes[both]) ** 2
+        brier_b = (b[both, j] - outcomes[both]) ** 2
+        d = brier_b - brier_a
+        differences.append(d)
+        n = len(d)
+        standard_error = d.std(ddof=1) / np.sqrt(n) if n > 1 else float("nan")
+        rows.append({
+            "method": shared_methods[j],
+            "n": n,
+            "brier_a": float(brier_a.mean()) if n else None,
+            "brier_b": float(brier_b.mean()) if n else None,
+            "delta": float(d.mean()) if n else None,
+            "delta_ci": [float(d.mean() - 1.96 * standard_error), float(d.mean() + 1.96 * standard_error)] if n > 1 else None,
+        })
+    p_values = permutation_p_values(differences, n_resamples)
+    for row, p, adjusted in zip(rows, p_values, holm(p_values)):
+        row["p_value"] = p
+        row["p_holm"] = adjusted
+    return rows
+
+
+def disagreements(index: CompareIndex, run_a: int, run_b: int, method: str = ENSEMBLE, top: int = DISAGREEMENTS_SHOWN) -> list:
+    """The shared questions where the two runs' forecasts for `method` differ most."""
+    question_ids, methods, a, b, outcomes = paired(index, run_a, run_b)
+    if method not in methods:
+        raise ValueError(f"{method} is not in both runs; shared methods: {', '.join(methods)}")
+    j = methods.index(method)
+    gap = np.abs(a[:, j] - b[:, j])
+    order = [i for i in np.argsort(-np.nan_to_num(gap, nan=-1.0)) if not np.isnan(gap[i])][:top]
+    titles = index.titles([question_ids[i] for i in order]) if order else {}
+    return [
+        {
+            "question_id": json.loads(question_ids[i]),
+            "title": titles.get(question_ids[i]),
+            "forecast_a": float(a[i, j]),
+            "forecast_b": float(b[i, j]),
+            "outcome": None if np.isnan(outcomes[i]) else float(outcomes[i]),
+        }
+        for i in order
+    ]
+
+
+def print_deltas(index: CompareIndex, run_a: int, run_b: int, rows: list):
+    print(f"A: [{run_a}] {index.run_path(run_a)}\nB: [{run_b}] {index.run_path(run_b)}")
+    print(f"{'method':<26}{'n':>6}{'brier A':>10}{'brier B':>10}{'B - A':>10}{'95% CI':>22}{'p':>9}{'p (Holm)':>10}")
+    for row in rows:
+        if not row["n"]:
+            print(f"{row['method']:<26}{0:>6}  no shared forecasts")
+            continue
+        ci = f"[{row['delta_ci'][0]:+.4f}, {row['delta_ci'][1]:+.4f}]" if row["delta_ci"] else ""
+        print(f"{row['method']:<26}{row['n']:>6}{row['brier_a']:>10.4f}{row['brier_b']:>10.4f}{row['delta']:>+10.4f}"
+              f"{ci:>22}{row['p_value']:>9.4f}{row['p_holm']:>10.4f}")
+    print("Negative B - A: B scored better. p: paired sign-flip permutation test on the shared questions.")
+
+
+def print_disagreements(method: str, rows: list):
+    print(f"{'question':>10}{'A':>7}{'B':>7}{'outcome':>9}  title ({method})")
+    for row in rows:
+        outcome = "" if row["outcome"] is None else f"{row['outcome']:.0f}"
+        print(f"{str(row['question_id']):>10}{row['forecast_a']:>7.2f}{row['forecast_b']:>7.2f}{outcome:>9}  {row['title'] or ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index experiment outputs and compare runs.")
+    parser.add_argument("--index", default=INDEX_PATH, help="SQLite index file")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="index new and changed result files")
+    index_parser.add_argument("paths", nargs="*", default=[OUTPUT_DIR],
+                              help="directories (scanned for .json reports), reports, results logs or stores")
+    commands.add_parser("runs", help="list indexed runs")
+    delta_parser = commands.add_parser("delta", help="per-method Brier deltas with paired significance tests")
+    delta_parser.add_argument("run_a", help="index ID or file path")
+    delta_parser.add_argument("run_b", help="index ID or file path")
+    delta_parser.add_argument("--methods", type=lambda value: value.split(","), help="comma-separated methods to compare")
+    delta_parser.add_argument("--resamples", type=int, default=PERMUTATION_RESAMPLES, help="permutation test resamples")
+    disagree_parser = commands.add_parser("disagree", help="questions where two runs' forecasts differ most")
+    disagree_parser.add_argument("run_a", help="index ID or file path")
+    disagree_parser.add_argument("run_b", help="index ID or file path")
+    disagree_parser.add_argument("--method", default=ENSEMBLE)
+    disagree_parser.add_argument("--top", type=int, default=DISAGREEMENTS_SHOWN)
+    args = parser.parse_args()
+
+    index = CompareIndex(args.index)
+    started = time.perf_counter()
+    if args.command == "index":
+        indexed = index.update(args.paths)
+        print(f"Indexed {len(indexed)} new or changed files in {time.perf_counter() - started:.2f}s ({index.path})")
+        sys.exit(0)
+    if pathlib.Path(OUTPUT_DIR).is_dir():
+        index.update([OUTPUT_DIR])
+
+    try:
+        if args.command == "runs":
+            result = index.runs()
+            if not args.json:
+                print(f"{'id':>4}{'questions':>11}{'methods':>9}{'ensemble':>10}  model / path")
+                for run in result:
+                    brier = "" if run["ensemble_mean_brier"] is None else f"{run['ensemble_mean_brier']:.4f}"
+                    print(f"{run['run_id']:>4}{run['questions']:>11}{run['methods']:>9}{brier:>10}  {run['model'] or ''}  {run['path']}")
+        elif args.command == "delta":
+            run_a, run_b = index.resolve(args.run_a), index.resolve(args.run_b)
+            result = brier_deltas(index, run_a, run_b, args.methods, args.resamples)
+            if not args.json:
+                print_deltas(index, run_a, run_b, result)
+        else:
+            run_a, run_b = index.resolve(args.run_a), index.resolve(args.run_b)
+            result = disagreements(index, run_a, run_b, args.method, args.top)
+            if not args.json:
+                print_disagreements(args.method, result)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    index.close()
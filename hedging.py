@@ -0,0 +1,135 @@
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+from instrumentation import tagged
+
+HEDGE_PERCENTILE = 95  # hedge a call once it is slower than this percentile of recent calls
+HEDGE_MAX_FRACTION = 0.1  # at most this many hedges per primary call
+HEDGE_MIN_SAMPLES = 20  # no hedging until the latency model has this many calls
+LATENCY_WINDOW = 500
+
+
+class Hedger:
+    """
+    Issues a duplicate request when a call runs past a learned latency
+    percentile; the first successful answer wins and the other is cancelled.
+    Latencies are learned per key (the model) from every successful primary
+    call; a hedged primary that loses is cancelled and its time so far is
+    learned instead, a lower bound that still keeps the slow tail in the window.
+    Both are measured from when the request was sent, so a call that is still
+    queued in the rate limiter or backing off between retries is never hedged.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = HEDGE_PERCENTILE,
+        max_fraction: float = HEDGE_MAX_FRACTION,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_WINDOW))
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_unsent = 0  # cancelled while still queued: cost nothing
+        self.hedge_wins = 0
+
+    def hedge_delay(self, key):
+        latencies = self.latencies[key]
+        if not self.enabled or len(latencies) < self.min_samples:
+            return None
+        return float(np.percentile(latencies, self.percentile))
+
+    def budget_allows(self) -> bool:
+        return self.hedges - self.hedges_unsent < self.max_fraction * self.calls
+
+    async def run(self, key, make_call):
+        """
+        Awaits `make_call(on_sent)`, hedging it with a second call if it is slow.
+        The call reports `on_sent(time.perf_counter())` whenever it sends its
+        request and `on_sent(None)` once that request is answered or has failed.
+        """
+        self.calls += 1
+        delay = self.hedge_delay(key)
+        sent = None
+        last_sent = None
+        sending = asyncio.Event()
+        backup = None
+        backup_sent = False
+
+        def on_sent(at):
+            nonlocal sent, last_sent
+            sent = at
+            if at is None:
+                sending.clear()
+            else:
+                last_sent = at
+                sending.set()
+
+        primary_done = None
+
+        def on_primary_done(_):
+            nonlocal primary_done
+            primary_done = time.perf_counter()
+
+        primary = asyncio.ensure_future(make_call(on_sent))
+        primary.add_done_callback(on_primary_done)
+        tasks = {primary}
+        try:
+            while delay is not None and not primary.done():
+                if sent is None:
+                    waiter = asyncio.ensure_future(sending.wait())
+                    try:
+                        await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        waiter.cancel()
+                    continue
+                remaining = sent + delay - time.perf_counter()
+                if remaining <= 0:
+                    break
+                await asyncio.wait(tasks, timeout=remaining)
+            if primary.done() or delay is None or not self.budget_allows():
+                return await primary
+
+            self.hedges += 1
+
+            def on_backup_sent(at):
+                nonlocal backup_sent
+                backup_sent = backup_sent or at is not None
+
+            with tagged(hedge=True):
+                backup = asyncio.ensure_future(make_call(on_backup_sent))
+            tasks.add(backup)
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            if last_sent is not None:
+                if not primary.done():
+                    if backup is not None:
+                        # Lost to its hedge: learned as the time it had taken so far, a lower bound
+                        self.latencies[key].append(time.perf_counter() - last_sent)
+                elif not primary.cancelled() and primary.exception() is None:
+                    self.latencies[key].append((primary_done or time.perf_counter()) - last_sent)
+            for task in tasks:
+                task.cancel()
+            if backup is not None and not backup_sent:
+                self.hedges_unsent += 1
+
+    def describe(self) -> str:
+        return (
+            f"{self.hedges} hedged of {self.calls} calls "
+            f"({self.hedges_unsent} cancelled before being sent, {self.hedge_wins} won by the hedge)"
+        )
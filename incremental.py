@@ -0,0 +1,217 @@
+"""
+Incremental runs: reuse every (question, method) result whose inputs are
+unchanged in a previous run and call the LLM only for the rest:
+
+    python incremental.py outputs/<previous run>.jsonl [dataset filters]
+
+A method's result is reused when its fingerprint (method prompt text,
+BINARY_PROMPT_TEMPLATE, model, temperature and samples) matches the previous
+run and it produced a forecast. A previous run with another --model,
+--temperature or --samples is refused, since nothing of it could be reused. Results written before fingerprints were recorded are
+matched by rebuilding the filled prompt instead. Added, edited and previously
+failed methods are run; methods no longer in BINARY_REASONING_PROMPTS are
+dropped. Research and the research date are reused from the previous run, so
+reused and new answers saw the same prompt context. The merged report is
+rescored from scratch.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import pathlib
+import sys
+
+import binary_test_system as bts
+from instrumentation import tagged
+from results_log import ResultsLog
+from results_store import BLOBS_FILE, ResultsStore
+from scoring import iter_result_file
+
+
+class PreviousResults:
+    """
+    Random access to a previous run's full results by question ID. Results
+    logs and stores (given by directory or by their report) are indexed by
+    offset and read on demand; a .json report is loaded whole.
+    """
+
+    def __init__(self, path):
+        path = pathlib.Path(path)
+        if (path.parent / BLOBS_FILE).exists() and path.suffix == ".json":
+            path = path.parent  # a results store's report has only the summary: read the store
+        self.store = ResultsStore(path) if path.is_dir() else None
+        self.log = ResultsLog(path) if path.suffix == ".jsonl" else None
+        self.results = None
+        if self.store is not None:
+            self.offsets = {result["question_id"]: offset for offset, result in self.store.iter_offsets()}
+        elif self.log is not None:
+            self.offsets = {result["question_id"]: offset for offset, result in self.log.iter_offsets()}
+        else:
+            self.results = {result["question_id"]: result for result in iter_result_file(path)}
+            self.offsets = dict.fromkeys(self.results)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def first(self):
+        """The first previous result, or None if there are none."""
+        return self.get(next(iter(self.offsets))) if self.offsets else None
+
+    def get(self, question_id):
+        if question_id not in self.offsets:
+            return None
+        if self.results is not None:
+            return self.results[question_id]
+        if self.store is not None:
+            return self.store.expand(self.store.record(question_id))
+        with open(self.log.path, "rb") as f:
+            f.seek(self.offsets[question_id])
+            return json.loads(f.readline())
+
+
+def reusable(previous: dict, question_details: dict, name: str, prompt: str, fingerprint: str) -> bool:
+    if name not in previous["individual_forecasts"] or name not in previous.get("responses", {}):
+        return False
+    recorded = previous.get("method_fingerprints", {}).get(name)
+    if recorded is not None:
+        return recorded == fingerprint
+    # Older results have no fingerprints: compare the filled prompt (same model assumed)
+    return previous["filled_prompts"].get(name) == bts.fill_prompt(question_details, prompt)
+
+
+def check_settings(previous: PreviousResults, settings: dict):
+    """
+    Raises ValueError if the previous run used other settings (run_settings)
+    than this one, as none of its results could then be reused. Results from
+    before settings were recorded are assumed to share the model and temperature.
+    """
+    first = previous.first()
+    if first is None:
+        return
+    recorded = first.get("settings")
+    if recorded is None:
+        samples = max((len(forecasts) for forecasts in first.get("sample_forecasts", {}).values()), default=1)
+        recorded = {"samples": samples}
+        print(f"Previous results do not record their model and temperature; "
+              f"assuming {settings['model']} at temperature {settings['temperature']}")
+    differing = [key for key in recorded if recorded[key] != settings[key]]
+    if differing:
+        raise ValueError(
+            f"the previous run used {', '.join(f'{key} {recorded[key]}' for key in differing)}, "
+            f"this run {', '.join(f'{key} {settings[key]}' for key in differing)}; pass the same "
+            f"{', '.join('--' + key for key in differing)} to reuse its results, or start a fresh run"
+        )
+
+
+class IncrementalRun:
+    """
+    Processes questions for incremental_main: reuses the previous results of
+    methods whose fingerprint is unchanged and runs the others (those the
+    method race has not eliminated) with the run's model, temperature and samples.
+    """
+
+    def __init__(self, previous: PreviousResults, model: str = bts.MODEL_NAME, temperature: float = 0.3, samples: int = None):
+        self.previous = previous
+        self.model = model
+        self.temperature = temperature
+        self.settings = bts.run_settings(model, temperature, samples)
+        self.samples = self.settings["samples"]
+        self.fingerprints = {
+            name: bts.method_fingerprint(prompt, model, temperature, self.samples)
+            for name, prompt in bts.BINARY_REASONING_PROMPTS
+        }
+        self.reused = 0
+        self.run = 0
+
+    async def process(self, question_details: dict) -> dict:
+        question_details.pop("previous_result", None)  # a retried question is rebuilt from the previous run
+        previous = self.previous.get(question_details["id"])
+        if previous is not None and not previous["filled_prompts"]:
+            previous = None  # its research failed: nothing to reuse
+        if previous is None:
+            await bts.prepare_question(question_details)
+            if "research_error" in question_details:
+                names = [name for name, _ in bts.BINARY_REASONING_PROMPTS]
+                return bts.research_failed_result(question_details, names, self.fingerprints, self.settings)
+        else:
+            question_details["summary_report"] = previous["summary_report"]
+            question_details["today"] = previous["research_end_prompt_date"]
+
+        active = {name for name, _ in bts.method_race.active_methods(bts.BINARY_REASONING_PROMPTS)}
+        tasks = {}
+        reused = {}
+        with tagged(question_id=question_details["id"]):
+            for name, prompt in bts.BINARY_REASONING_PROMPTS:
+                if previous is not None and reusable(previous, question_details, name, prompt, self.fingerprints[name]):
+                    reused[name] = bts.previous_method_result(previous, name, bts.fill_prompt(question_details, prompt))
+                elif name in active:
+                    tasks[name] = bts.run_reasoning_method(
+                        question_details, name, prompt, self.model, self.temperature, self.samples
+                    )
+            fresh = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+        self.reused += len(reused)
+        self.run += len(fresh)
+        results = [
+            reused[name] if name in reused else fresh[name]
+            for name, _ in bts.BINARY_REASONING_PROMPTS if name in reused or name in fresh
+        ]
+        return bts.build_question_result(question_details, results, self.fingerprints, self.settings)
+
+
+async def incremental_main(
+    previous_path,
+    model: str = bts.MODEL_NAME,
+    temperature: float = 0.3,
+    question_concurrency: int = bts.QUESTION_CONCURRENCY,
+    dataset: str = bts.FILE,
+    question_filters: dict = None,
+    output: str = None,
+    **settings,
+):
+    """Runs an incremental experiment; `settings` are those of bts.configure_run."""
+    bts.configure_run(**settings)
+    previous = PreviousResults(previous_path)
+    print(f"Loaded {len(previous)} previous results from {previous_path}")
+    run = IncrementalRun(previous, model, temperature, bts.samples_per_method)
+    check_settings(previous, run.settings)
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    results_log = ResultsLog(output or pathlib.Path("outputs") / f"incremental_results_{timestamp}.jsonl")
+    question_order = await bts.run_questions(
+        results_log,
+        dataset,
+        question_filters,
+        lambda questions, on_result: bts.run_question_pipeline(questions, on_result, question_concurrency, run.process),
+    )
+    print(f"\nReused {run.reused} method results from {previous_path}; ran {run.run} methods")
+    bts.report_run(results_log, question_order)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rerun only the reasoning methods that changed since a previous run.")
+    parser.add_argument("previous", help="previous run: final .json report, .jsonl results log or results store")
+    parser.add_argument("--model", default=bts.MODEL_NAME,
+                        help="model to run changed methods with; must be the previous run's to reuse its results")
+    parser.add_argument("--temperature", type=float, default=0.3,
+                        help="sampling temperature; must be the previous run's to reuse its results")
+    parser.add_argument("--question-concurrency", type=int, default=bts.QUESTION_CONCURRENCY,
+                        help="number of questions in flight at once")
+    parser.add_argument("--output", metavar="RESULTS_JSONL",
+                        help="write the merged results log here instead of a timestamped file; an existing log is resumed")
+    bts.add_run_arguments(parser)
+    bts.add_cache_arguments(parser)
+    bts.add_dataset_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(incremental_main(
+            args.previous,
+            model=args.model,
+            temperature=args.temperature,
+            question_concurrency=args.question_concurrency,
+            dataset=args.file,
+            question_filters=bts.question_filters_from_args(args),
+            output=args.output,
+            **bts.run_settings_from_args(args),
+        ))
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
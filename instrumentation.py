@@ -0,0 +1,208 @@
+"""
+Per-call tracing for the forecasting harness. Every LLM and research call is
+written to a JSONL trace with its queue wait, request latency, tokens, retries
+and errors, tagged with the question and reasoning method it belongs to.
+
+Convert a trace for chrome://tracing or Perfetto with:
+
+    python instrumentation.py outputs/<run>.trace.jsonl --chrome trace.json
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import pathlib
+import time
+
+import numpy as np
+
+# Tags (question_id, method, ...) for calls made from the current task
+call_tags = contextvars.ContextVar("call_tags", default={})
+
+
+@contextlib.contextmanager
+def tagged(**tags):
+    token = call_tags.set({**call_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        call_tags.reset(token)
+
+
+class CallRecord:
+    def __init__(self, kind: str, fields: dict):
+        self.kind = kind
+        self.fields = fields
+        self.start = time.time()
+        self.queue_wait = 0.0
+        self.latency = 0.0
+        self.retries = 0
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.reasoning_tokens = None
+        self.error = None
+        self.cancelled = False
+
+    def set_usage(self, usage):
+        if usage is None:
+            return
+        self.prompt_tokens = usage.prompt_tokens
+        self.completion_tokens = usage.completion_tokens
+        details = getattr(usage, "completion_tokens_details", None)
+        self.reasoning_tokens = getattr(details, "reasoning_tokens", None)
+
+    def as_dict(self, duration: float) -> dict:
+        return {
+            "kind": self.kind,
+            **call_tags.get(),
+            **self.fields,
+            "start": self.start,
+            "duration": duration,
+            "queue_wait": self.queue_wait,
+            "latency": self.latency,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reasoning_tokens": self.reasoning_tokens,
+            "error": self.error,
+            "cancelled": self.cancelled,
+        }
+
+
+class Tracer:
+    """
+    Streams call records to a JSONL trace file and keeps just the numbers
+    needed for the end-of-run percentile and throughput summary.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._file = None
+        self._stats = {}
+
+    def open(self, path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._stats = {}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @contextlib.contextmanager
+    def call(self, kind: str, **fields):
+        """Times one logical call, including its retries; yields the CallRecord to fill in."""
+        record = CallRecord(kind, fields)
+        started = time.perf_counter()
+        try:
+            yield record
+        except asyncio.CancelledError:
+            record.cancelled = True  # e.g. the losing request of a hedged pair
+            raise
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            self.add(record.as_dict(time.perf_counter() - started))
+
+    def add(self, entry: dict):
+        stats = self._stats.setdefault(entry["kind"], {
+            "duration": [], "queue_wait": [], "latency": [], "retries": 0, "errors": 0, "cancelled": 0, "hedges": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "reasoning_tokens": 0,
+            "first_start": entry["start"], "last_end": entry["start"],
+        })
+        for key in ("duration", "queue_wait", "latency"):
+            stats[key].append(entry[key])
+        for key in ("prompt_tokens", "completion_tokens", "reasoning_tokens"):
+            stats[key] += entry.get(key) or 0
+        stats["retries"] += entry["retries"]
+        stats["errors"] += entry["error"] is not None
+        stats["cancelled"] += bool(entry.get("cancelled"))
+        stats["hedges"] += bool(entry.get("hedge"))
+        stats["first_start"] = min(stats["first_start"], entry["start"])
+        stats["last_end"] = max(stats["last_end"], entry["start"] + entry["duration"])
+        if self._file is not None:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def summary(self) -> dict:
+        summary = {}
+        for kind, stats in self._stats.items():
+            calls = len(stats["duration"])
+            wall = max(stats["last_end"] - stats["first_start"], 1e-9)
+            summary[kind] = {
+                "calls": calls,
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "cancelled": stats["cancelled"],
+                "hedges": stats["hedges"],
+                "calls_per_second": calls / wall,
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+                "reasoning_tokens": stats["reasoning_tokens"],
+            }
+            for key in ("duration", "queue_wait", "latency"):
+                p50, p95, p99 = np.percentile(stats[key], [50, 95, 99])
+                summary[kind][key] = {"p50": p50, "p95": p95, "p99": p99}
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print("\nCall timings (seconds)        p50      p95      p99")
+        for kind, s in summary.items():
+            for key in ("queue_wait", "latency", "duration"):
+                p = s[key]
+                print(f"{kind + ' ' + key:<28}{p['p50']:>8.2f} {p['p95']:>8.2f} {p['p99']:>8.2f}")
+            print(
+                f"{kind}: {s['calls']} calls, {s['calls_per_second']:.2f} calls/s, "
+                f"{s['retries']} retries, {s['errors']} errors, "
+                f"{s['hedges']} hedges, {s['cancelled']} cancelled, "
+                f"{s['prompt_tokens']} prompt / {s['completion_tokens']} completion "
+                f"({s['reasoning_tokens']} reasoning) tokens"
+            )
+        if self.path is not None:
+            print(f"Trace written to {self.path}")
+
+
+def to_chrome_trace(trace_path, chrome_path):
+    """Converts a JSONL trace to the Chrome trace event format, one row per question."""
+    events = []
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            row = str(entry.get("question_id", entry["kind"]))
+            name = entry.get("method") or entry["kind"]
+            start_us = entry["start"] * 1e6
+            args = {k: v for k, v in entry.items() if k not in ("start", "duration")}
+            if entry["queue_wait"]:
+                events.append({
+                    "name": f"{name} (queued)", "cat": "queue", "ph": "X", "pid": 1, "tid": row,
+                    "ts": start_us, "dur": entry["queue_wait"] * 1e6,
+                })
+            events.append({
+                "name": name, "cat": entry["kind"], "ph": "X", "pid": 1, "tid": row,
+                "ts": start_us, "dur": entry["duration"] * 1e6, "args": args,
+            })
+    with open(chrome_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a call trace or convert it to Chrome trace format.")
+    parser.add_argument("trace", help="a .trace.jsonl file written by binary_main")
+    parser.add_argument("--chrome", metavar="OUT_JSON", help="write a Chrome/Perfetto trace to this path")
+    args = parser.parse_args()
+
+    tracer = Tracer()
+    with open(args.trace, "r", encoding="utf-8") as f:
+        for line in f:
+            tracer.add(json.loads(line))
+    tracer.print_summary()
+    if args.chrome:
+        to_chrome_trace(args.trace, args.chrome)
+        print(f"Chrome trace written to {args.chrome}")
@@ -0,0 +1,216 @@
+"""
+Local stand-ins for the OpenAI chat completions API and the Perplexity API,
+for benchmarking and regression-testing the harness without spending money:
+
+    python mock_servers.py --llm-port 8001 --research-port 8002
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 PERPLEXITY_BASE_URL=http://127.0.0.1:8002 ...
+
+Latency is lognormal, and a configurable share of requests fail with 500 or 429.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class MockConfig:
+    def __init__(
+        self,
+        median_latency: float = 0.05,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        requests_per_minute: int = 10_000,
+        tokens_per_minute: int = 10_000_000,
+        seed: int = None,
+        supports_n: bool = True,
+    ):
+        self.median_latency = median_latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.supports_n = supports_n
+        self.random = random.Random(seed)
+
+    def latency(self) -> float:
+        return self.median_latency * self.random.lognormvariate(0, self.latency_sigma)
+
+
+def llm_answer(body: dict, rng: random.Random) -> str:
+    return f"Mock reasoning for the forecast.\n\nProbability: {rng.randint(1, 99)}%"
+
+
+def research_answer(body: dict, rng: random.Random) -> str:
+    question = body["messages"][-1]["content"]
+    return f"Mock research summary for: {question}\nNo decisive news found before the cutoff date."
+
+
+class MockServer:
+    """
+    Minimal HTTP/1.1 server answering POSTs in the chat completions format.
+    Runs on its own event loop in a background thread.
+    """
+
+    def __init__(self, answer, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.answer = answer
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response_headers, payload = await self._respond(json.loads(body or b"{}"))
+                data = json.dumps(payload).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}"]
+                response_headers.update({"content-type": "application/json", "content-length": str(len(data))})
+                head += [f"{k}: {v}" for k, v in response_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, body: dict):
+        config = self.config
+        self.requests += 1
+        headers = {
+            "x-ratelimit-limit-requests": str(config.requests_per_minute),
+            "x-ratelimit-limit-tokens": str(config.tokens_per_minute),
+            "x-ratelimit-remaining-requests": str(config.requests_per_minute - 1),
+            "x-ratelimit-remaining-tokens": str(config.tokens_per_minute - 1),
+            "x-ratelimit-reset-requests": "1s",
+            "x-ratelimit-reset-tokens": "1s",
+        }
+        roll = config.random.random()
+        if roll < config.rate_limit_rate:
+            self.rate_limited += 1
+            headers.update({"retry-after-ms": "200", "x-ratelimit-remaining-requests": "0"})
+            return 429, headers, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+
+        if (body.get("n") or 1) > 1 and not config.supports_n:
+            return 400, headers, {"error": {"message": "n > 1 is not supported with this model", "type": "invalid_request_error", "param": "n", "code": "unsupported_value"}}
+
+        await asyncio.sleep(config.latency())
+        if roll < config.rate_limit_rate + config.error_rate:
+            self.errors += 1
+            return 500, headers, {"error": {"message": "Mock server error", "type": "server_error", "code": None}}
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4 + 1
+        choices = []
+        for index in range(body.get("n") or 1):
+            content = self.answer(body, config.random)
+            choices.append({
+                "index": index,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            })
+        completion_tokens = sum(len(choice["message"]["content"]) // 4 + 1 for choice in choices)
+        return 200, headers, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "completion_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+
+def start_mock_servers(llm_config: MockConfig = None, research_config: MockConfig = None, llm_port: int = 0, research_port: int = 0):
+    """Starts both servers; returns (llm_server, research_server)."""
+    llm_server = MockServer(llm_answer, llm_config, port=llm_port).start()
+    research_server = MockServer(research_answer, research_config, port=research_port).start()
+    return llm_server, research_server
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--median-latency", type=float, default=0.05, help="median LLM latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal sigma of LLM latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of LLM requests failing with 429")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def mock_config_from_args(args) -> MockConfig:
+    return MockConfig(
+        median_latency=args.median_latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run mock OpenAI and Perplexity servers.")
+    parser.add_argument("--llm-port", type=int, default=8001)
+    parser.add_argument("--research-port", type=int, default=8002)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    llm_server, research_server = start_mock_servers(
+        mock_config_from_args(args), MockConfig(seed=args.seed), args.llm_port, args.research_port
+    )
+    print(f"Mock OpenAI API:     OPENAI_BASE_URL={llm_server.base_url}/v1")
+    print(f"Mock Perplexity API: PERPLEXITY_BASE_URL={research_server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        llm_server.stop()
+        research_server.stop()
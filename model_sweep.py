@@ -0,0 +1,280 @@
+"""
+Runs every reasoning method against several models in one pass:
+
+    python model_sweep.py --models models.json [dataset filters]
+    python model_sweep.py --models o3,gpt-4.1 [dataset filters]
+
+models.json is a list of model settings, for example
+
+    [
+      {"model": "o3", "temperature": 1, "concurrency": 9},
+      {"model": "gpt-4.1", "concurrency": 20, "rpm": 5000},
+      {"model": "llama-3.3-70b", "base_url": "http://localhost:8000/v1",
+       "api_key_env": "LOCAL_API_KEY", "concurrency": 4}
+    ]
+
+Research is fetched once per question and shared by every model. Each model
+has its own client, rate limiter and workers, so a slow model falls behind on
+its own instead of holding up the others. A question is written to the results
+log, with forecasts keyed "label/method", once every model has answered it.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import pathlib
+
+import numpy as np
+from openai import AsyncOpenAI
+
+import binary_test_system as bts
+from instrumentation import tagged
+from rate_limiter import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, AdaptiveRateLimiter
+from results_log import ResultsLog
+
+DEFAULT_TEMPERATURE = 0.3
+MAX_PENDING_QUESTIONS = 64  # how far the fastest model may run ahead of the slowest
+
+
+class ModelSpec:
+    def __init__(
+        self,
+        model: str,
+        temperature: float = DEFAULT_TEMPERATURE,
+        concurrency: int = bts.CONCURRENT_REQUESTS_LIMIT,
+        base_url: str = None,
+        api_key_env: str = "OPENAI_API_KEY",
+        rpm: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tpm: float = DEFAULT_TOKENS_PER_MINUTE,
+        label: str = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.concurrency = concurrency
+        self.base_url = base_url or bts.OPENAI_BASE_URL
+        self.api_key_env = api_key_env
+        self.rpm = rpm
+        self.tpm = tpm
+        self.label = label or model
+
+    def as_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "model": self.model,
+            "temperature": self.temperature,
+            "concurrency": self.concurrency,
+            "base_url": self.base_url,
+        }
+
+
+def parse_models(value: str) -> list:
+    """Model settings from a JSON file, or from a comma-separated list of model names."""
+    if value.endswith(".json"):
+        with open(value, "r", encoding="utf-8") as f:
+            specs = [ModelSpec(**entry) for entry in json.load(f)]
+    else:
+        specs = [ModelSpec(name.strip()) for name in value.split(",") if name.strip()]
+    if not specs:
+        raise ValueError("No models given")
+    labels = [spec.label for spec in specs]
+    duplicates = sorted({label for label in labels if labels.count(label) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate model labels {duplicates}; give each entry a distinct \"label\"")
+    return specs
+
+
+def setup_endpoints(specs: list) -> dict:
+    """
+    Creates one client and rate limiter per model and registers them with
+    binary_test_system. Entries for the same model (e.g. at two temperatures)
+    share one pool sized by their combined concurrency.
+    """
+    by_model = {}
+    for spec in specs:
+        by_model.setdefault(spec.model, []).append(spec)
+    endpoints = {}
+    for model, model_specs in by_model.items():
+        first = model_specs[0]
+        if any((spec.base_url, spec.api_key_env) != (first.base_url, first.api_key_env) for spec in model_specs):
+            raise ValueError(f"Entries for {model} must share base_url and api_key_env")
+        api_key = os.getenv(first.api_key_env)
+        model_client = AsyncOpenAI(base_url=first.base_url, api_key=api_key, max_retries=0) if api_key else None
+        rate_limiter = AdaptiveRateLimiter(
+            sum(spec.concurrency for spec in model_specs),
+            sum(spec.rpm for spec in model_specs),
+            sum(spec.tpm for spec in model_specs),
+        )
+        endpoints[model] = (model_client, rate_limiter)
+    bts.model_endpoints.update(endpoints)
+    return endpoints
+
+
+def pair_names(specs: list) -> list:
+    return [f"{spec.label}/{name}" for spec in specs for name, _ in bts.BINARY_REASONING_PROMPTS]
+
+
+async def run_sweep(questions, specs: list, on_result, question_concurrency: int, max_pending: int = MAX_PENDING_QUESTIONS):
+    """
+    Researches each question once and fans it out to one queue per model. Every
+    model has `question_concurrency` workers of its own, and its LLM calls are
+    bounded by its own rate limiter. At most `max_pending` questions are held
+    between research and the slowest model. `on_result(index, result)` is
+    called as each question is finished by every model.
+    """
+    queues = {spec.label: asyncio.Queue() for spec in specs}
+    fingerprints = {
+        f"{spec.label}/{name}": bts.method_fingerprint(prompt, spec.model, spec.temperature)
+        for spec in specs for name, prompt in bts.BINARY_REASONING_PROMPTS
+    }
+    slots = asyncio.Semaphore(max_pending)
+    pending = {}
+
+    async def research(i: int, question_details: dict):
+        question_details.pop("previous_result", None)  # a retried question is run again for every model
+        await bts.prepare_question(question_details)
+        if "research_error" in question_details:
+            on_result(i, bts.research_failed_result(question_details, pair_names(specs), fingerprints))
+            slots.release()
+            return
+        pending[question_details["id"]] = {}
+        for queue in queues.values():
+            queue.put_nowait((i, question_details))
+
+    async def producer():
+        tasks = []
+        for i, question_details in enumerate(questions):
+            await slots.acquire()
+            tasks.append(asyncio.ensure_future(research(i, question_details)))
+            tasks = [task for task in tasks if not task.done() or task.exception() is not None]
+        await asyncio.gather(*tasks)
+        for queue in queues.values():
+            for _ in range(question_concurrency):
+                queue.put_nowait(None)
+
+    async def worker(spec: ModelSpec):
+        queue = queues[spec.label]
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, question_details = item
+            with tagged(question_id=question_details["id"]):
+                results = await asyncio.gather(*[
+                    bts.run_reasoning_method(question_details, name, prompt, spec.model, spec.temperature)
+                    for name, prompt in bts.BINARY_REASONING_PROMPTS
+                ])
+            by_model = pending[question_details["id"]]
+            by_model[spec.label] = [(f"{spec.label}/{name}", *rest) for name, *rest in results]
+            if len(by_model) == len(specs):
+                del pending[question_details["id"]]
+                merged = [result for s in specs for result in by_model[s.label]]
+                on_result(i, bts.build_question_result(question_details, merged, fingerprints))
+                slots.release()
+
+    await asyncio.gather(producer(), *[worker(spec) for spec in specs for _ in range(question_concurrency)])
+
+
+def print_sweep_result(result: dict, done: int, specs: list):
+    print(f"\nFinished Question {done}: '{result['title']}'")
+    for spec in specs:
+        prefix = f"{spec.label}/"
+        briers = [b for name, b in result["individual_brier_scores"].items() if name.startswith(prefix)]
+        missing = sum(name.startswith(prefix) for name in result["missing_methods"])
+        mean = f"{np.mean(briers):.4f}" if briers else "n/a"
+        print(f" - {spec.label}: mean method Brier = {mean}, {missing} missing")
+    if result["ensemble_brier"] is not None:
+        print(f"Ensemble Brier: {result['ensemble_brier']:.4f}")
+    print("-" * 40)
+
+
+def print_sweep_summary(sorted_scores: list, mean_ensemble_brier: float, specs: list):
+    print("\nMean Brier Scores by model/method (ranked):")
+    for rank, (name, score) in enumerate(sorted_scores, 1):
+        print(f"{rank}. {name}: {bts.format_brier(score)}")
+
+    print("\nMean Brier Scores by model (average over methods):")
+    for spec in specs:
+        scores = [score for name, score in sorted_scores if name.startswith(f"{spec.label}/") and score is not None]
+        mean = f"{np.mean(scores):.4f}" if scores else "n/a"
+        _, rate_limiter = bts.model_endpoints[spec.model]
+        print(f"{spec.label}: {mean}  (rate limiter: {rate_limiter.describe()})")
+
+    print(f"\nEnsemble Mean Brier (all models): {bts.format_brier(mean_ensemble_brier)}")
+    print(f"Research cache: {bts.research_cache.stats()}")
+    print(f"LLM cache: {bts.llm_cache.stats()}")
+    bts.tracer.print_summary()
+
+
+async def sweep_main(
+    specs: list,
+    question_concurrency: int = bts.QUESTION_CONCURRENCY,
+    max_pending: int = MAX_PENDING_QUESTIONS,
+    research_cache_mode: str = "read_write",
+    llm_cache_mode: str = "record",
+    resume: str = None,
+    dataset: str = bts.FILE,
+    question_filters: dict = None,
+):
+    setup_endpoints(specs)
+    bts.research_cache.mode = research_cache_mode
+    bts.llm_cache.mode = llm_cache_mode
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = pathlib.Path("outputs")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if resume:
+        results_log = ResultsLog(resume)
+    else:
+        results_log = ResultsLog(output_dir / f"model_sweep_results_{timestamp}.jsonl")
+
+    print(f"Sweeping {len(specs)} models x {len(bts.BINARY_REASONING_PROMPTS)} methods: "
+          f"{', '.join(spec.label for spec in specs)}")
+    question_order = await bts.run_questions(
+        results_log,
+        dataset,
+        question_filters,
+        lambda questions, on_result: run_sweep(questions, specs, on_result, question_concurrency, max_pending),
+        lambda result, done: print_sweep_result(result, done, specs),
+    )
+
+    sorted_scores, mean_ensemble_brier = bts.write_final_report(
+        results_log,
+        results_log.path.with_suffix(".json"),
+        question_order,
+        method_names=pair_names(specs),
+        models=[spec.as_dict() for spec in specs],
+    )
+    print("Saved experiment results as json.")
+    print_sweep_summary(sorted_scores, mean_ensemble_brier, specs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the binary forecasting experiment for several models at once.")
+    parser.add_argument("--models", required=True,
+                        help="a JSON file of model settings, or comma-separated model names")
+    parser.add_argument("--question-concurrency", type=int, default=bts.QUESTION_CONCURRENCY,
+                        help="questions in flight at once for each model")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING_QUESTIONS,
+                        help="questions the fastest model may run ahead of the slowest")
+    parser.add_argument("--resume", metavar="RESULTS_JSONL",
+                        help="continue an interrupted sweep, skipping questions already in its results log")
+    bts.add_cache_arguments(parser)
+    bts.add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        model_specs = parse_models(args.models)
+    except (OSError, TypeError, ValueError) as e:
+        parser.error(f"--models: {e}")
+
+    asyncio.run(sweep_main(
+        model_specs,
+        question_concurrency=args.question_concurrency,
+        max_pending=args.max_pending,
+        research_cache_mode=args.research_cache,
+        llm_cache_mode=args.llm_cache,
+        resume=args.resume,
+        dataset=args.file,
+        question_filters=bts.question_filters_from_args(args),
+    ))
@@ -0,0 +1,347 @@
+"""
+Dry-run planner: estimates what binary_main would send for a dataset before
+any quota is spent, without calling the LLM or Perplexity:
+
+    python planner.py [dataset filters] [--model o3 --samples 3 --call-concurrency 9 --rpm 500]
+    python planner.py --trace outputs/<earlier run>.trace.jsonl [dataset filters]
+
+Every filled prompt is counted, a question at a time, with tiktoken when it is
+installed and the rate limiter's characters/4 estimate otherwise. Research
+comes from the research cache; questions without cached research are counted
+with a placeholder of --research-tokens and as one research call each. The
+report gives prompt and completion tokens per method and per question,
+projected online and batch cost, a projected wall time for the configured
+concurrency and rate limits, and the prompts that would not fit the model's
+context window or exceed --max-prompt-tokens. A trace from an earlier run
+replaces the default call latencies and completion sizes with measured ones.
+"""
+import argparse
+import json
+import statistics
+
+import numpy as np
+
+import binary_test_system as bts
+from cache import SQLiteCache
+from question_loader import load_questions
+from rate_limiter import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# USD per million (prompt, completion) tokens
+PRICES_PER_MILLION_TOKENS = {
+    "o3": (2.00, 8.00),
+    "o4-mini": (1.10, 4.40),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "sonar-pro": (3.00, 15.00),
+}
+CONTEXT_WINDOWS = {
+    "o3": 200_000,
+    "o4-mini": 200_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
+BATCH_DISCOUNT = 0.5  # batch API price relative to online calls
+MESSAGE_OVERHEAD_TOKENS = 7  # chat formatting around each message
+DEFAULT_RESEARCH_TOKENS = 1000  # research summary size assumed when it is not cached
+DEFAULT_CALL_LATENCY_SECONDS = 60.0
+DEFAULT_RESEARCH_LATENCY_SECONDS = 20.0
+SHOW_LARGEST = 10
+
+
+def token_counter(model: str):
+    """Returns (count(text) -> int, description): tiktoken if available, else about four characters per token."""
+    if tiktoken is None:
+        return estimate_tokens, "characters/4 estimate (install tiktoken for exact counts)"
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # encodings are downloaded on first use
+        return estimate_tokens, f"characters/4 estimate (tiktoken unavailable: {type(e).__name__})"
+    return (lambda text: len(encoding.encode(text, disallowed_special=()))), f"tiktoken {encoding.name}"
+
+
+def trace_measurements(trace_path) -> dict:
+    """Median latencies and mean completion tokens of the successful calls in a trace."""
+    latencies = {"llm": [], "research": []}
+    completions = {"llm": [], "research": []}
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            kind = entry.get("kind")
+            if kind not in latencies or entry.get("error") or entry.get("cancelled"):
+                continue
+            latencies[kind].append(entry["latency"])
+            if entry.get("completion_tokens") is not None:
+                completions[kind].append(entry["completion_tokens"] / entry.get("n", 1))
+    return {
+        "llm_latency": statistics.median(latencies["llm"]) if latencies["llm"] else None,
+        "research_latency": statistics.median(latencies["research"]) if latencies["research"] else None,
+        "completion_tokens": statistics.mean(completions["llm"]) if completions["llm"] else None,
+        "research_tokens": statistics.mean(completions["research"]) if completions["research"] else None,
+    }
+
+
+class Plan:
+    """Token totals for a dataset x method matrix, accumulated one question at a time."""
+
+    def __init__(self, methods: list, count_tokens, research_tokens: int, context_window: int, max_prompt_tokens: int):
+        self.methods = methods
+        self.count_tokens = count_tokens
+        self.research_tokens = research_tokens
+        self.context_window = context_window
+        self.max_prompt_tokens = max_prompt_tokens
+        # The method prompt is the only part of a filled prompt that differs between
+        # methods, so each prompt is counted as question context + method prompt
+        # (exact up to a token or two where the two meet).
+        self.method_tokens = {name: count_tokens(prompt) for name, prompt in methods}
+        self.method_prompt_tokens = dict.fromkeys(self.method_tokens, 0)
+        self.question_tokens = {}
+        self.questions = 0
+        self.research_calls = 0
+        self.research_prompt_tokens = 0
+        self.oversized = []
+
+    def add(self, question_details: dict):
+        end_date = bts.iso_to_mmddyyyy(question_details["open_time"])
+        research = bts.research_cache.get(SQLiteCache.make_key("sonar-pro", question_details["title"], end_date))
+        if research is None:
+            self.research_calls += 1
+            self.research_prompt_tokens += (
+                self.count_tokens(bts.PERPLEXITY_SYSTEM_PROMPT) + self.count_tokens(question_details["title"])
+                + 2 * MESSAGE_OVERHEAD_TOKENS
+            )
+        question_details = dict(question_details, today=end_date, summary_report=research or "")
+        context = self.count_tokens(bts.fill_prompt(question_details, "")) + MESSAGE_OVERHEAD_TOKENS
+        if research is None:
+            context += self.research_tokens
+
+        total = 0
+        for name, tokens in self.method_tokens.items():
+            prompt_tokens = context + tokens
+            self.method_prompt_tokens[name] += prompt_tokens
+            total += prompt_tokens
+            if prompt_tokens > self.max_prompt_tokens or prompt_tokens + bts.ESTIMATED_COMPLETION_TOKENS > self.context_window:
+                self.oversized.append((question_details["id"], name, prompt_tokens))
+        self.question_tokens[question_details["id"]] = total
+        self.questions += 1
+
+    @property
+    def calls(self) -> int:
+        return self.questions * len(self.methods)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(self.method_prompt_tokens.values())
+
+
+def projected_wall_time(
+    plan: Plan,
+    calls: int,
+    tokens_per_call: float,
+    call_latency: float,
+    research_latency: float,
+    question_concurrency: int,
+    call_concurrency: int,
+    requests_per_minute: float,
+    tokens_per_minute: float,
+) -> tuple:
+    """
+    Returns (seconds, limiting factor). LLM calls run at the lowest of the
+    concurrency, request and token rates; research for later questions
+    overlaps with reasoning on earlier ones.
+    """
+    in_flight = min(call_concurrency, question_concurrency * len(plan.methods))
+    rates = {
+        "call concurrency": in_flight / call_latency,
+        "requests per minute": requests_per_minute / 60,
+        "tokens per minute": tokens_per_minute / 60 / tokens_per_call if tokens_per_call else float("inf"),
+    }
+    limit = min(rates, key=rates.get)
+    llm_seconds = calls / rates[limit] if calls else 0.0
+    research_seconds = plan.research_calls * research_latency / bts.RESEARCH_CONCURRENCY_LIMIT
+    if research_seconds > llm_seconds:
+        return research_seconds + call_latency, "research concurrency"
+    return llm_seconds + (research_latency if plan.research_calls else 0.0), limit
+
+
+def cost(model: str, prompt_tokens: float, completion_tokens: float, prices: tuple = None):
+    prices = prices or PRICES_PER_MILLION_TOKENS.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6
+
+
+def format_cost(value) -> str:
+    return "n/a (unknown price; pass --prices)" if value is None else f"${value:,.2f}"
+
+
+def format_duration(seconds: float) -> str:
+    hours, rest = divmod(int(round(seconds)), 3600)
+    return f"{hours}h {rest // 60:02d}m {rest % 60:02d}s"
+
+
+def plan_main(
+    model: str = bts.MODEL_NAME,
+    samples: int = bts.SAMPLES_PER_METHOD,
+    question_concurrency: int = bts.QUESTION_CONCURRENCY,
+    call_concurrency: int = bts.CONCURRENT_REQUESTS_LIMIT,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+    completion_tokens: float = None,
+    research_tokens: int = None,
+    call_latency: float = None,
+    research_latency: float = None,
+    trace: str = None,
+    prices: tuple = None,
+    max_prompt_tokens: int = None,
+    dataset: str = bts.FILE,
+    question_filters: dict = None,
+    output: str = None,
+) -> dict:
+    measured = trace_measurements(trace) if trace else {}
+    completion_tokens = completion_tokens or measured.get("completion_tokens") or bts.ESTIMATED_COMPLETION_TOKENS
+    research_tokens = research_tokens or round(measured.get("research_tokens") or DEFAULT_RESEARCH_TOKENS)
+    call_latency = call_latency or measured.get("llm_latency") or DEFAULT_CALL_LATENCY_SECONDS
+    research_latency = research_latency or measured.get("research_latency") or DEFAULT_RESEARCH_LATENCY_SECONDS
+    context_window = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+    count_tokens, tokenizer = token_counter(model)
+    bts.research_cache.mode = "read_write"  # only read: nothing is fetched, so nothing is written
+    plan = Plan(bts.BINARY_REASONING_PROMPTS, count_tokens, research_tokens, context_window,
+                max_prompt_tokens or context_window)
+    for question_details in load_questions(dataset, **(question_filters or {})):
+        plan.add(question_details)
+
+    # n samples are n choices of one call: the prompt is sent once, completions are billed n times
+    total_completion_tokens = plan.calls * samples * completion_tokens
+    llm_cost = cost(model, plan.prompt_tokens, total_completion_tokens, prices)
+    research_cost = cost("sonar-pro", plan.research_prompt_tokens, plan.research_calls * research_tokens)
+    # The rate limiter reserves the prompt plus the completion allowance against the TPM budget
+    tokens_per_call = plan.prompt_tokens / plan.calls + bts.ESTIMATED_COMPLETION_TOKENS * samples if plan.calls else 0
+    wall_seconds, limit = projected_wall_time(
+        plan, plan.calls, tokens_per_call, call_latency, research_latency,
+        question_concurrency, call_concurrency, requests_per_minute, tokens_per_minute,
+    )
+
+    print(f"Planned {plan.questions} questions x {len(plan.methods)} methods = {plan.calls} calls to {model}"
+          + (f", {samples} samples each" if samples > 1 else "") + f" (tokens: {tokenizer})")
+    print(f"Research: {plan.questions - plan.research_calls} cached, {plan.research_calls} to fetch"
+          + (f" (counted as {research_tokens} tokens each)" if plan.research_calls else ""))
+
+    print(f"\n{'Method':<32}{'prompt tokens':>16}{'per call':>10}{'completion':>14}{'cost':>14}")
+    for name, _ in plan.methods:
+        prompt_tokens = plan.method_prompt_tokens[name]
+        method_completion = plan.questions * samples * completion_tokens
+        per_call = prompt_tokens / plan.questions if plan.questions else 0
+        method_cost = cost(model, prompt_tokens, method_completion, prices)
+        print(f"{name:<32}{prompt_tokens:>16,}{per_call:>10,.0f}{method_completion:>14,.0f}"
+              f"{'n/a' if method_cost is None else f'${method_cost:,.2f}':>14}")
+    print(f"{'Total':<32}{plan.prompt_tokens:>16,}{'':>10}{total_completion_tokens:>14,.0f}"
+          f"{'n/a' if llm_cost is None else f'${llm_cost:,.2f}':>14}")
+    print(f"(completion tokens estimated at {completion_tokens:,.0f} per answer"
+          + (", measured from the trace" if measured.get("completion_tokens") and completion_tokens == measured["completion_tokens"] else "") + ")")
+
+    if plan.question_tokens:
+        per_question = np.array(list(plan.question_tokens.values()))
+        print(f"\nPrompt tokens per question: mean {per_question.mean():,.0f}, "
+              f"p50 {np.percentile(per_question, 50):,.0f}, p95 {np.percentile(per_question, 95):,.0f}, "
+              f"max {per_question.max():,}")
+        largest = sorted(plan.question_tokens.items(), key=lambda item: -item[1])[:SHOW_LARGEST]
+        print("Largest questions: " + ", ".join(f"{question_id} ({tokens:,})" for question_id, tokens in largest))
+
+    if plan.oversized:
+        print(f"\n{len(plan.oversized)} oversized prompts (over {plan.max_prompt_tokens:,} tokens, or too long for "
+              f"{model}'s {context_window:,}-token window with {bts.ESTIMATED_COMPLETION_TOKENS:,} reserved for the answer):")
+        for question_id, name, tokens in sorted(plan.oversized, key=lambda item: -item[2])[:SHOW_LARGEST * 2]:
+            print(f" - question {question_id}, {name}: {tokens:,} tokens")
+
+    total_cost = None if llm_cost is None or research_cost is None else llm_cost + research_cost
+    print(f"\nProjected cost: {format_cost(llm_cost)} for {model}, {format_cost(research_cost)} for research"
+          + (f", {format_cost(total_cost)} in total" if total_cost is not None else ""))
+    if llm_cost is not None:
+        print(f"Through batch_mode.py: {format_cost(llm_cost * BATCH_DISCOUNT)} for {model}, "
+              f"no wall time to manage (24h completion window)")
+    print(f"Projected wall time online: {format_duration(wall_seconds)}, limited by {limit} "
+          f"({call_concurrency} calls in flight, {requests_per_minute:g} RPM, {tokens_per_minute:g} TPM, "
+          f"{call_latency:.1f}s per call, {research_latency:.1f}s per research call)")
+
+    summary = {
+        "model": model,
+        "tokenizer": tokenizer,
+        "questions": plan.questions,
+        "methods": len(plan.methods),
+        "samples": samples,
+        "calls": plan.calls,
+        "research_calls": plan.research_calls,
+        "prompt_tokens": plan.prompt_tokens,
+        "completion_tokens": total_completion_tokens,
+        "prompt_tokens_by_method": plan.method_prompt_tokens,
+        "prompt_tokens_by_question": plan.question_tokens,
+        "oversized_prompts": [
+            {"question_id": question_id, "method": name, "prompt_tokens": tokens}
+            for question_id, name, tokens in plan.oversized
+        ],
+        "llm_cost": llm_cost,
+        "research_cost": research_cost,
+        "batch_llm_cost": None if llm_cost is None else llm_cost * BATCH_DISCOUNT,
+        "wall_seconds": wall_seconds,
+        "wall_time_limited_by": limit,
+    }
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Plan written to {output}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the tokens, cost and wall time of a run without making any calls.")
+    parser.add_argument("--model", default=bts.MODEL_NAME)
+    parser.add_argument("--samples", type=int, default=bts.SAMPLES_PER_METHOD,
+                        help="completions per method, as binary_test_system.py --samples")
+    parser.add_argument("--question-concurrency", type=int, default=bts.QUESTION_CONCURRENCY)
+    parser.add_argument("--call-concurrency", type=int, default=bts.CONCURRENT_REQUESTS_LIMIT)
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE)
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TOKENS_PER_MINUTE)
+    parser.add_argument("--trace", help="a .trace.jsonl from an earlier run, for measured latencies and completion sizes")
+    parser.add_argument("--completion-tokens", type=float,
+                        help=f"completion tokens per answer, reasoning included (default: from --trace, else {bts.ESTIMATED_COMPLETION_TOKENS})")
+    parser.add_argument("--research-tokens", type=int,
+                        help=f"tokens assumed for research that is not cached (default: from --trace, else {DEFAULT_RESEARCH_TOKENS})")
+    parser.add_argument("--latency", type=float,
+                        help=f"seconds per reasoning call (default: from --trace, else {DEFAULT_CALL_LATENCY_SECONDS:g})")
+    parser.add_argument("--research-latency", type=float,
+                        help=f"seconds per research call (default: from --trace, else {DEFAULT_RESEARCH_LATENCY_SECONDS:g})")
+    parser.add_argument("--prices", type=lambda value: tuple(float(p) for p in value.split(",")), metavar="PROMPT,COMPLETION",
+                        help="USD per million prompt and completion tokens, for models without a built-in price")
+    parser.add_argument("--max-prompt-tokens", type=int,
+                        help="flag prompts over this many tokens (default: those that do not fit the context window)")
+    parser.add_argument("--json", metavar="PATH", help="also write the plan as JSON")
+    bts.add_dataset_arguments(parser)
+    args = parser.parse_args()
+    plan_main(
+        model=args.model,
+        samples=args.samples,
+        question_concurrency=args.question_concurrency,
+        call_concurrency=args.call_concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        completion_tokens=args.completion_tokens,
+        research_tokens=args.research_tokens,
+        call_latency=args.latency,
+        research_latency=args.research_latency,
+        trace=args.trace,
+        prices=args.prices,
+        max_prompt_tokens=args.max_prompt_tokens,
+        dataset=args.file,
+        question_filters=bts.question_filters_from_args(args),
+        output=args.json,
+    )
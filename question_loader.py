@@ -0,0 +1,198 @@
+import datetime
+import hashlib
+import json
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+class _JSONReader:
+    """Reads JSON values from a text file in chunks, holding about one value in memory."""
+
+    def __init__(self, f):
+        self.f = f
+        self.name = getattr(f, "name", "JSON input")
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self, skipped: str = " \t\r\n") -> str:
+        """The next character after any `skipped` ones, or "" at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in skipped:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"{self.name}: expected {char!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number cut off by the chunk boundary ("1", "0.", "1e-") decodes
+            # as its prefix; no valid value is followed by one of ".eE+-"
+            if (end == len(self.buffer) or self.buffer[end] in ".eE+-") and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Streams the elements of the array that starts here."""
+        self.expect("[")
+        while True:
+            char = self.peek(" \t\r\n,")
+            if char == "]":
+                self.pos += 1
+                return
+            if not char:
+                raise ValueError(f"{self.name}: unexpected end of file inside JSON array")
+            yield self.value()
+
+    def members(self, key: str, members: dict = None):
+        """Streams the elements of the `key` array of the object that starts here; its other members go into `members`."""
+        self.expect("{")
+        found = False
+        while True:
+            char = self.peek(" \t\r\n,")
+            if char == "}":
+                self.pos += 1
+                break
+            if not char:
+                raise ValueError(f"{self.name}: unexpected end of file inside JSON object")
+            name = self.value()
+            self.expect(":")
+            if name == key:
+                found = True
+                yield from self.items()
+            elif members is not None:
+                members[name] = self.value()
+            else:
+                self.value()
+        if not found:
+            raise ValueError(f"no {key} list")
+
+
+def iter_json_array(source, key: str = None, members: dict = None):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading the
+    file in chunks so that memory stays flat regardless of file size. `source`
+    is a path or an open text file. With `key`, a top-level object is read too:
+    the elements of its `key` array are yielded and its other members, before
+    or after the array, are put into `members` as they are read.
+    """
+    if not hasattr(source, "read"):
+        with open(source, "r", encoding="utf-8") as f:
+            yield from iter_json_array(f, key, members)
+        return
+    reader = _JSONReader(source)
+    first = reader.peek()
+    if first == "[":
+        yield from reader.items()
+    elif key is not None and first == "{":
+        yield from reader.members(key, members)
+    else:
+        raise ValueError(f"{reader.name} does not contain a JSON array")
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_questions(path):
+    """Streams questions from a JSON array file or a JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+    if first == "[":
+        return iter_json_array(path)
+    return iter_jsonl(path)
+
+
+def parse_shard(spec: str):
+    """Parses "k/n" (1-based) into (k, n)."""
+    try:
+        k, n = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}, expected k/n such as 2/4")
+    if not 1 <= k <= n:
+        raise ValueError(f"Invalid shard {spec!r}, k must be between 1 and n")
+    return k, n
+
+
+def question_shard(question_id, n: int) -> int:
+    """Stable 1-based shard for a question ID, the same on every process and host."""
+    digest = hashlib.sha256(str(question_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % n + 1
+
+
+def parse_date(value: str) -> datetime.datetime:
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def question_tags(question: dict) -> set:
+    tags = set()
+    for tag in question.get("tags") or []:
+        if isinstance(tag, dict):
+            tag = tag.get("slug") or tag.get("name")
+        if tag:
+            tags.add(str(tag).lower())
+    return tags
+
+
+def filter_questions(questions, ids=None, opened_after=None, opened_before=None, tags=None, shard=None):
+    """
+    Lazily applies the resolution, ID, open-date, tag and shard filters.
+    Only questions resolved yes/no are kept (to remove ambigious resolved questions).
+    """
+    ids = {str(question_id) for question_id in ids} if ids else None
+    tags = {tag.lower() for tag in tags} if tags else None
+    opened_after = parse_date(opened_after) if opened_after else None
+    opened_before = parse_date(opened_before) if opened_before else None
+
+    for q in questions:
+        if (q.get("resolution") or "").lower().strip() not in ["yes", "no"]:
+            continue
+        if ids is not None and str(q["id"]) not in ids:
+            continue
+        if opened_after or opened_before:
+            if not q.get("open_time"):
+                continue
+            open_time = parse_date(q["open_time"])
+            if opened_after and open_time < opened_after:
+                continue
+            if opened_before and open_time >= opened_before:
+                continue
+        if tags is not None and not tags & question_tags(q):
+            continue
+        if shard is not None and question_shard(q["id"], shard[1]) != shard[0]:
+            continue
+        yield q
+
+
+def load_questions(path, **filters):
+    """Streams the filtered questions of a dataset as a generator."""
+    return filter_questions(iter_questions(path), **filters)
@@ -0,0 +1,151 @@
+import math
+import statistics
+
+import numpy as np
+
+RACE_CONFIDENCE = 0.95  # confidence that an eliminated method is worse than the current best
+RACE_MIN_QUESTIONS = 30  # paired questions needed before a method can be eliminated
+
+
+class MethodRace:
+    """
+    Racing-style adaptive evaluation. Per-question Brier scores are accumulated
+    as paired differences between every two methods, and a method stops being
+    scheduled once its mean paired difference to the current best is positive
+    with the configured confidence, after at least `min_questions` shared questions.
+
+    The test is re-run after every question against a best method chosen from
+    the same data, so the one-sided z-test's alpha is split over all ordered
+    pairs of racing methods and spent over looks as alpha * m / (n (n + 1)),
+    for n >= m paired questions, which sums to alpha over an unbounded race.
+    """
+
+    def __init__(
+        self,
+        methods: list,
+        enabled: bool = False,
+        confidence: float = RACE_CONFIDENCE,
+        min_questions: int = RACE_MIN_QUESTIONS,
+    ):
+        self.methods = list(methods)
+        self.enabled = enabled
+        self.confidence = confidence
+        self.min_questions = min_questions
+        n = len(self.methods)
+        self.column = {name: j for j, name in enumerate(self.methods)}
+        self.brier_sums = np.zeros(n)
+        self.counts = np.zeros(n)
+        # [i, j] accumulates brier_i - brier_j, and brier_i, over questions both methods answered
+        self.diff_sums = np.zeros((n, n))
+        self.paired_sums = np.zeros((n, n))
+        self.diff_squares = np.zeros((n, n))
+        self.pair_counts = np.zeros((n, n))
+        self.questions = 0
+        self.eliminated = {}
+        self.skipped_calls = 0
+
+    def active_methods(self, prompts: list) -> list:
+        """The (name, prompt) pairs still racing; counts the calls saved on the rest."""
+        active = [(name, prompt) for name, prompt in prompts if name not in self.eliminated]
+        self.skipped_calls += len(prompts) - len(active)
+        return active
+
+    def update(self, result: dict) -> list:
+        """Adds one question's Brier scores; returns the methods eliminated because of it."""
+        briers = np.full(len(self.methods), np.nan)
+        for name, brier in result["individual_brier_scores"].items():
+            if name in self.column:
+                briers[self.column[name]] = brier
+        valid = ~np.isnan(briers)
+        both = valid[:, None] & valid[None, :]
+        diffs = np.where(both, briers[:, None] - briers[None, :], 0.0)
+        self.questions += 1
+        self.brier_sums[valid] += briers[valid]
+        self.counts += valid
+        self.diff_sums += diffs
+        self.paired_sums += np.where(both, briers[:, None], 0.0)
+        self.diff_squares += diffs ** 2
+        self.pair_counts += both
+        return self.eliminate() if self.enabled else []
+
+    def mean_briers(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.brier_sums / self.counts
+
+    def best(self):
+        racing = [j for j, name in enumerate(self.methods) if name not in self.eliminated and self.counts[j]]
+        if not racing:
+            return None
+        means = self.mean_briers()
+        return min(racing, key=lambda j: means[j])
+
+    def eliminate(self) -> list:
+        best = self.best()
+        if best is None:
+            return []
+        racing = [j for j, name in enumerate(self.methods) if name not in self.eliminated and j != best]
+        if not racing:
+            return []
+        pair_alpha = (1 - self.confidence) / (len(racing) * (len(racing) + 1))
+        newly_eliminated = []
+        for j in racing:
+            n = self.pair_counts[j, best]
+            if n < max(self.min_questions, 2):
+                continue
+            alpha = pair_alpha * self.min_questions / (n * (n + 1))
+            z_critical = statistics.NormalDist().inv_cdf(1 - alpha)
+            mean_diff = self.diff_sums[j, best] / n
+            if mean_diff <= 0:
+                continue
+            variance = max(self.diff_squares[j, best] - n * mean_diff ** 2, 0.0) / (n - 1)
+            standard_error = math.sqrt(variance / n)
+            z = math.inf if standard_error == 0 else mean_diff / standard_error
+            if z > z_critical:
+                name = self.methods[j]
+                self.eliminated[name] = {
+                    "after_questions": self.questions,
+                    "best_method": self.methods[best],
+                    "mean_brier_difference": float(mean_diff),
+                    "z": float(z) if math.isfinite(z) else None,
+                    "paired_questions": int(n),
+                }
+                newly_eliminated.append(name)
+        return newly_eliminated
+
+    def describe_elimination(self, name: str) -> str:
+        info = self.eliminated[name]
+        return (
+            f"Eliminated {name} after {info['after_questions']} questions: mean Brier "
+            f"+{info['mean_brier_difference']:.4f} vs {info['best_method']} over {info['paired_questions']} questions"
+        )
+
+    def paired_comparison(self, name: str):
+        """
+        The mean Brier of `name` and of the current best method over the
+        questions both answered, or None. An eliminated method's own mean covers
+        fewer questions than a survivor's, so only this comparison is like for like.
+        """
+        best = self.best()
+        j = self.column[name]
+        if best is None or best == j or not self.pair_counts[j, best]:
+            return None
+        n = self.pair_counts[j, best]
+        return {
+            "best_method": self.methods[best],
+            "paired_questions": int(n),
+            "mean_brier": float(self.paired_sums[j, best] / n),
+            "best_mean_brier": float(self.paired_sums[best, j] / n),
+        }
+
+    def describe_paired(self, name: str) -> str:
+        comparison = self.paired_comparison(name)
+        if comparison is None:
+            return f"{name}: no questions in common with the best method"
+        return (
+            f"{name}: mean Brier {comparison['mean_brier']:.4f} vs {comparison['best_mean_brier']:.4f} "
+            f"for {comparison['best_method']} on the {comparison['paired_questions']} questions both ran"
+        )
+
+    def describe(self) -> str:
+        racing = len(self.methods) - len(self.eliminated)
+        return f"{len(self.eliminated)} of {len(self.methods)} methods eliminated, {racing} racing, {self.skipped_calls} calls saved"
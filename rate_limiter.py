@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import itertools
+import random
+import re
+import time
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 500_000
+HEADROOM = 0.95  # stay just under the provider's advertised limits
+BACKOFF_FACTOR = 0.7  # capacity multiplier after a 429
+RECOVERY_STEP = 0.05  # fraction of the ceiling regained per successful call
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size; about four characters per token for English text."""
+    return len(text) // 4 + 1
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def parse_duration(value: str) -> float:
+    """Parses rate limit reset durations such as '1s', '6m0s', '20ms' or '0.5' into seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self.refill()
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket, not forever
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def set_capacity(self, capacity: float):
+        self.refill()
+        self.capacity = max(1.0, capacity)
+        self.level = min(self.level, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limits LLM calls by concurrency, requests/minute and tokens/minute.
+    Calls waiting for a concurrency slot are let in lowest `priority` first,
+    in arrival order among equal priorities (so FIFO when no priority is given).
+    A priority may be a function, evaluated each time a slot frees up.
+
+    The budgets start from the configured values and adapt: rate limit headers
+    set the ceiling, a 429 cuts the budgets and pauses new calls until the
+    provider's retry-after, and each success regains a little of the ceiling.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests_ceiling = float(requests_per_minute)
+        self.tokens_ceiling = float(tokens_per_minute)
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._free_slots = max_concurrency
+        self._waiters = []  # (priority, arrival, future)
+        self._arrivals = itertools.count()
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+
+    async def _acquire_slot(self, priority):
+        if self._free_slots > 0 and not self._waiters:
+            self._free_slots -= 1
+            return
+        waiter = (priority, next(self._arrivals), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter[2]
+        except asyncio.CancelledError:
+            if waiter[2].done() and not waiter[2].cancelled():
+                self._release_slot()  # handed a slot just as we were cancelled: pass it on
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        if not self._waiters:
+            self._free_slots += 1
+            return
+        # A linear scan: waiters are bounded by the calls of the questions in flight
+        waiter = min(self._waiters, key=lambda w: (w[0]() if callable(w[0]) else w[0], w[1]))
+        self._waiters.remove(waiter)
+        waiter[2].set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, estimated_tokens: int, priority=0.0):
+        """Waits for a concurrency slot, by priority, then for enough request/token budget."""
+        self.queue_depth += 1
+        try:
+            await self._acquire_slot(priority)
+            try:
+                async with self._lock:
+                    while True:
+                        wait = max(
+                            self._paused_until - time.monotonic(),
+                            self.requests.wait_time(1),
+                            self.tokens.wait_time(estimated_tokens),
+                        )
+                        if wait <= 0:
+                            break
+                        await asyncio.sleep(wait)
+                    self.requests.level -= 1
+                    self.tokens.level -= min(estimated_tokens, self.tokens.capacity)
+            except BaseException:
+                self._release_slot()
+                raise
+        finally:
+            self.queue_depth -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._release_slot()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Refunds (or charges) the difference between the estimate and the real usage."""
+        self.tokens.refill()
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+
+    def update_from_headers(self, headers):
+        """Learns the provider's limits from x-ratelimit-* response headers after a success."""
+        limit_requests = headers.get("x-ratelimit-limit-requests")
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        if limit_requests:
+            self.requests_ceiling = float(limit_requests) * HEADROOM
+        if limit_tokens:
+            self.tokens_ceiling = float(limit_tokens) * HEADROOM
+
+        self.requests.set_capacity(min(self.requests_ceiling, self.requests.capacity + RECOVERY_STEP * self.requests_ceiling))
+        self.tokens.set_capacity(min(self.tokens_ceiling, self.tokens.capacity + RECOVERY_STEP * self.tokens_ceiling))
+
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests:
+            self.requests.level = min(self.requests.level, float(remaining_requests))
+        if remaining_tokens:
+            self.tokens.level = min(self.tokens.level, float(remaining_tokens))
+
+    def on_rate_limited(self, headers=None) -> float:
+        """
+        Backs off after a 429: cuts both budgets and pauses new calls until the
+        provider's retry-after. Returns the number of seconds to wait before retrying.
+        """
+        self.rate_limited += 1
+        if time.monotonic() >= self._paused_until:
+            # A burst of 429s from calls already in flight only counts as one signal
+            self.requests.set_capacity(self.requests.capacity * BACKOFF_FACTOR)
+            self.tokens.set_capacity(self.tokens.capacity * BACKOFF_FACTOR)
+
+        retry_after = None
+        if headers is not None:
+            retry_after_ms = headers.get("retry-after-ms")
+            if retry_after_ms:
+                retry_after = float(retry_after_ms) / 1000
+            else:
+                retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after is None:
+                # Wait for whichever budget ran out to reset
+                resets = [
+                    parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    for kind in ("requests", "tokens")
+                    if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+                ]
+                resets = [reset for reset in resets if reset is not None]
+                retry_after = max(resets) if resets else None
+        if retry_after is None:
+            retry_after = BACKOFF_BASE_SECONDS
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return retry_after
+
+    def status(self) -> dict:
+        return {
+            "requests_per_minute": round(self.requests.capacity),
+            "tokens_per_minute": round(self.tokens.capacity),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rate_limited": self.rate_limited,
+        }
+
+    def describe(self) -> str:
+        s = self.status()
+        return (
+            f"{s['requests_per_minute']} RPM, {s['tokens_per_minute']} TPM, "
+            f"{s['in_flight']}/{s['max_concurrency']} in flight, {s['queue_depth']} queued, "
+            f"{s['rate_limited']} rate limited"
+        )
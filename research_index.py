@@ -0,0 +1,174 @@
+"""
+Local similarity index over question texts, used to reuse research across
+near-duplicate questions (e.g. a templated series that differs only in a
+threshold or a date). Texts are MinHash-signed over word shingles and bucketed
+with LSH banding, so lookups stay cheap for thousands of questions. The index
+is kept in SQLite next to the research cache, so it carries across runs.
+"""
+import datetime
+import re
+import sqlite3
+import pathlib
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 2  # words per shingle
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity usually share a bucket
+SIMILARITY_THRESHOLD = 0.8  # estimated Jaccard similarity needed to reuse research
+REUSE_MAX_AGE_DAYS = 7  # reuse as-is when the earlier research cutoff is at most this old
+REFRESH_MAX_AGE_DAYS = 90  # otherwise ask only for news since the earlier cutoff, up to this age
+MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_B = _rng.integers(0, MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+
+
+def question_text(question_details: dict) -> str:
+    return f"{question_details['title']}\n{question_details.get('description') or ''}"
+
+
+def shingles(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature: per permutation, the minimum of (a * x + b) mod p over shingle hashes x."""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.int64) % MERSENNE_PRIME
+    return ((np.outer(hashes, _A) + _B) % MERSENNE_PRIME).min(axis=0)
+
+
+def band_keys(signature: np.ndarray) -> list:
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+
+def parse_search_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, "%m/%d/%Y").date()
+
+
+class IndexEntry:
+    def __init__(self, question_id: str, title: str, end_date: str, research_key: str, signature: np.ndarray):
+        self.question_id = question_id
+        self.title = title  # the title the research was searched for
+        self.end_date = end_date  # that search's cutoff, as mm/dd/yyyy
+        self.research_key = research_key  # research cache key of the research text
+        self.signature = signature
+
+
+class ResearchIndex:
+    """
+    Finds research that a question may reuse: that of the most similar indexed
+    question whose search cutoff is on or before the question's own, so that
+    reused research can never contain anything from after the question's cutoff.
+    """
+
+    def __init__(
+        self,
+        path,
+        enabled: bool = False,
+        threshold: float = SIMILARITY_THRESHOLD,
+        reuse_max_age_days: int = REUSE_MAX_AGE_DAYS,
+        refresh_max_age_days: int = REFRESH_MAX_AGE_DAYS,
+    ):
+        self.path = pathlib.Path(path)
+        self.enabled = enabled
+        self.threshold = threshold
+        self.reuse_max_age_days = reuse_max_age_days
+        self.refresh_max_age_days = refresh_max_age_days
+        self.reused = 0
+        self.refreshed = 0
+        self.fresh = 0
+        self._conn = None
+        self._entries = {}
+        self._buckets = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (question_id TEXT PRIMARY KEY, title TEXT NOT NULL, "
+                "end_date TEXT NOT NULL, research_key TEXT NOT NULL, signature BLOB NOT NULL)"
+            )
+            for row in self._conn.execute("SELECT question_id, title, end_date, research_key, signature FROM entries"):
+                self._index(IndexEntry(*row[:4], np.frombuffer(row[4], dtype=np.int64)))
+        return self._conn
+
+    def _index(self, entry: IndexEntry):
+        self.discard(entry.question_id)
+        self._entries[entry.question_id] = entry
+        for key in band_keys(entry.signature):
+            self._buckets.setdefault(key, set()).add(entry.question_id)
+
+    def add(self, question_id, title: str, end_date: str, research_key: str, text: str):
+        """Indexes a question's text with the research it used (searched for `title` up to `end_date`)."""
+        entry = IndexEntry(str(question_id), title, end_date, research_key, minhash(text))
+        conn = self._connect()
+        self._index(entry)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (entry.question_id, title, end_date, research_key, entry.signature.tobytes()),
+            )
+
+    def discard(self, question_id):
+        entry = self._entries.pop(str(question_id), None)
+        if entry is None:
+            return
+        for key in band_keys(entry.signature):
+            self._buckets.get(key, set()).discard(entry.question_id)
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute("DELETE FROM entries WHERE question_id = ?", (entry.question_id,))
+
+    def match(self, question_id, text: str, end_date: str):
+        """
+        Returns (entry, "reuse" | "refresh") for the best reusable research,
+        or None if the question needs research of its own.
+        """
+        self._connect()
+        signature = minhash(text)
+        cutoff = parse_search_date(end_date)
+        candidates = set()
+        for key in band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(str(question_id))
+
+        best, best_similarity = None, self.threshold
+        for candidate_id in candidates:
+            entry = self._entries[candidate_id]
+            if parse_search_date(entry.end_date) > cutoff:
+                continue  # searched past this question's cutoff: never reusable
+            similarity = float(np.mean(entry.signature == signature))
+            if similarity > best_similarity or (
+                best is not None and similarity == best_similarity
+                and parse_search_date(entry.end_date) > parse_search_date(best.end_date)
+            ):
+                best, best_similarity = entry, similarity
+            elif best is None and similarity == best_similarity:
+                best = entry
+        if best is None:
+            return None
+        age = (cutoff - parse_search_date(best.end_date)).days
+        if age <= self.reuse_max_age_days:
+            return best, "reuse"
+        if age <= self.refresh_max_age_days:
+            return best, "refresh"
+        return None
+
+    def describe(self) -> str:
+        return (
+            f"{self.reused} reused, {self.refreshed} refreshed with a narrow update search, "
+            f"{self.fresh} researched; {self.reused} research calls saved"
+        )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,83 @@
+import json
+import os
+import pathlib
+
+
+class ResultsLog:
+    """
+    Append-only JSONL log of per-question results. Each record is flushed and
+    fsync'd as it is written, so a crash loses at most the question in flight.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._file = None
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._drop_partial_record()
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _drop_partial_record(self):
+        # A crash mid-write can leave a last line without its newline; cut it off.
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size - 1
+            chunk = 4096
+            while pos > 0:
+                start = max(0, pos - chunk)
+                f.seek(start)
+                idx = f.read(pos - start).rfind(b"\n")
+                if idx != -1:
+                    f.truncate(start + idx + 1)
+                    return
+                pos = start
+            f.truncate(0)
+
+    def append(self, result: dict):
+        self._file.write(json.dumps(result) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def iter_results(self):
+        """Streams results back from disk one at a time."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    def iter_offsets(self):
+        """Yields (offset, result) for each complete record."""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if line.endswith(b"\n"):
+                    yield offset, json.loads(line)
+                offset += len(line)
+
+    def completed_ids(self) -> set:
+        return {result["question_id"] for result in self.iter_results()}
@@ -0,0 +1,231 @@
+"""
+Compact, deduplicated results store: a directory holding
+
+    blobs.sqlite     every distinct text (research, prompt pieces, responses) once, by sha256
+    results.jsonl    per-question records with forecasts, scores and blob hashes
+    forecasts.npz    the (questions x methods) forecast matrix, for analysis without any text
+    results.json     the run's report: its summary only, as the records above are the results
+
+The filled prompts of one question differ only in their reasoning prompt, so each is
+stored as the question's shared context (split around the research summary, which is
+stored once) plus a method suffix that is the same for every question. Texts are
+rebuilt on demand.
+
+Convert existing outputs, or inspect a store:
+
+    python results_store.py compact outputs/<run>.jsonl --out outputs/<run>.store
+    python results_store.py show outputs/<run>.store QUESTION_ID --method FERMI_METHOD
+    python results_store.py expand outputs/<run>.store --out full.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+
+from results_log import ResultsLog
+from scoring import FORECASTS_FILE, RESULTS_FILE, ForecastMatrix, iter_result_file
+
+BLOBS_FILE = "blobs.sqlite"
+TEXT_FIELDS = ("summary_report", "filled_prompts", "responses", "sample_responses")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def common_prefix(texts: list) -> str:
+    if len(texts) < 2:
+        return ""
+    first, last = min(texts), max(texts)
+    n = 0
+    while n < len(first) and first[n] == last[n]:
+        n += 1
+    return first[:n]
+
+
+def split_prompts(prompts: dict, research: str):
+    """
+    Returns (context pieces, suffixes by method) such that each filled prompt is
+    "".join(pieces) + its suffix. When every prompt has the research at the same
+    place, it is a piece of its own, so it is never stored twice, however few
+    prompts there are.
+    """
+    if research and all(research in prompt for prompt in prompts.values()):
+        heads = {prompt[:prompt.find(research)] for prompt in prompts.values()}
+        if len(heads) == 1:
+            head = heads.pop()
+            rests = {name: prompt[len(head) + len(research):] for name, prompt in prompts.items()}
+            tail = common_prefix(list(rests.values()))
+            return [head, research, tail], {name: rest[len(tail):] for name, rest in rests.items()}
+    context = common_prefix(list(prompts.values()))
+    return [context], {name: prompt[len(context):] for name, prompt in prompts.items()}
+
+
+class ResultsStore(ResultsLog):
+    """
+    A ResultsLog that keeps result text out of the log. `append` takes a full
+    result dict and writes its texts to the blob table and a compact record to
+    results.jsonl; `expand`, `filled_prompt`, `response` and `research` rebuild
+    texts only when asked for.
+    """
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+        super().__init__(self.directory / RESULTS_FILE)
+        self._blobs = None
+        self._offsets = None
+
+    def open(self):
+        super().open()
+        self._connect()
+        return self
+
+    def close(self):
+        super().close()
+        if self._blobs is not None:
+            self._blobs.close()
+            self._blobs = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._blobs is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._blobs = sqlite3.connect(self.directory / BLOBS_FILE)
+            self._blobs.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, text TEXT NOT NULL)")
+        return self._blobs
+
+    def put_text(self, text: str) -> str:
+        key = text_hash(text)
+        self._connect().execute("INSERT OR IGNORE INTO blobs (hash, text) VALUES (?, ?)", (key, text))
+        return key
+
+    def text(self, key: str) -> str:
+        row = self._connect().execute("SELECT text FROM blobs WHERE hash = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(f"No text {key} in {self.directory / BLOBS_FILE}")
+        return row[0]
+
+    def compact(self, result: dict) -> dict:
+        """Stores the result's texts and returns its compact record."""
+        research = result["summary_report"]
+        pieces, suffixes = split_prompts(result["filled_prompts"], research)
+        record = {key: value for key, value in result.items() if key not in TEXT_FIELDS}
+        record["blobs"] = {
+            "summary_report": self.put_text(research),
+            "prompt_context": [self.put_text(piece) for piece in pieces],
+            "prompt_suffixes": {name: self.put_text(suffix) for name, suffix in suffixes.items()},
+            "responses": {name: self.put_text(response) for name, response in result["responses"].items()},
+        }
+        if "sample_responses" in result:
+            record["blobs"]["sample_responses"] = {
+                name: [self.put_text(response) for response in responses]
+                for name, responses in result["sample_responses"].items()
+            }
+        return record
+
+    def append(self, result: dict):
+        record = self.compact(result)
+        self._blobs.commit()  # texts are durable before the record that points at them
+        super().append(record)
+
+    def record(self, question_id) -> dict:
+        """The compact record of one question (its latest, if it was retried)."""
+        if self._offsets is None:
+            self._offsets = {result["question_id"]: offset for offset, result in self.iter_offsets()}
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[question_id])
+            return json.loads(f.readline())
+
+    def _record(self, record_or_id) -> dict:
+        return record_or_id if isinstance(record_or_id, dict) else self.record(record_or_id)
+
+    def filled_prompt(self, record_or_id, method: str) -> str:
+        blobs = self._record(record_or_id)["blobs"]
+        pieces = blobs["prompt_context"] + [blobs["prompt_suffixes"][method]]
+        return "".join(self.text(key) for key in pieces)
+
+    def response(self, record_or_id, method: str):
+        key = self._record(record_or_id)["blobs"]["responses"].get(method)
+        return None if key is None else self.text(key)
+
+    def research(self, record_or_id) -> str:
+        return self.text(self._record(record_or_id)["blobs"]["summary_report"])
+
+    def expand(self, record: dict) -> dict:
+        """Rebuilds the full result dict, as binary_main writes it without a store."""
+        result = {key: value for key, value in record.items() if key != "blobs"}
+        blobs = record["blobs"]
+        result["summary_report"] = self.text(blobs["summary_report"])
+        result["filled_prompts"] = {name: self.filled_prompt(record, name) for name in blobs["prompt_suffixes"]}
+        result["responses"] = {name: self.text(key) for name, key in blobs["responses"].items()}
+        if "sample_responses" in blobs:
+            result["sample_responses"] = {
+                name: [self.text(key) for key in keys] for name, keys in blobs["sample_responses"].items()
+            }
+        return result
+
+    def write_forecasts(self, methods: list = None) -> ForecastMatrix:
+        """Writes forecasts.npz from the latest record of each question."""
+        latest = {}
+        for result in self.iter_results():
+            latest[result["question_id"]] = result
+        matrix = ForecastMatrix.from_results(latest.values(), methods)
+        matrix.save_npz(self.directory / FORECASTS_FILE)
+        return matrix
+
+
+def compact_file(source, directory) -> ResultsStore:
+    """Converts a .json report or .jsonl results log into a results store."""
+    store = ResultsStore(directory)
+    if store.path.exists():
+        raise ValueError(f"{store.directory} already holds a results store")
+    with store:
+        for result in iter_result_file(source):
+            store.append(result)
+    store.write_forecasts()
+    return store
+
+
+def directory_size(path) -> int:
+    return sum(f.stat().st_size for f in pathlib.Path(path).iterdir() if f.is_file())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert, inspect or expand compact results stores.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="convert a .json report or .jsonl log into a store")
+    compact_parser.add_argument("source")
+    compact_parser.add_argument("--out", required=True, help="store directory to create")
+    show_parser = commands.add_parser("show", help="print one question's rebuilt prompt and response")
+    show_parser.add_argument("store")
+    show_parser.add_argument("question_id", type=json.loads, help="question ID (JSON, so 123 is a number)")
+    show_parser.add_argument("--method", help="reasoning method; defaults to the research summary")
+    expand_parser = commands.add_parser("expand", help="write the full results back out as JSONL")
+    expand_parser.add_argument("store")
+    expand_parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        try:
+            store = compact_file(args.source, args.out)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        before = os.path.getsize(args.source)
+        after = directory_size(store.directory)
+        print(f"{args.source}: {before / 2 ** 20:.2f} MB -> {store.directory}: {after / 2 ** 20:.2f} MB")
+    elif args.command == "show":
+        store = ResultsStore(args.store)
+        if args.method:
+            print(f"--- filled prompt ({args.method}) ---\n{store.filled_prompt(args.question_id, args.method)}")
+            print(f"--- response ({args.method}) ---\n{store.response(args.question_id, args.method)}")
+        else:
+            print(store.research(args.question_id))
+        store.close()
+    else:
+        store = ResultsStore(args.store)
+        with open(args.out, "w", encoding="utf-8") as out:
+            for record in store.iter_results():
+                out.write(json.dumps(store.expand(record)) + "\n")
+        store.close()
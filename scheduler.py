@@ -0,0 +1,139 @@
+"""
+Makespan-aware call ordering. When more LLM calls are waiting than there are
+slots, the rate limiter lets in the call with the longest expected latency
+first (longest-processing-time-first), so that the slowest calls do not start
+last and leave the other slots idle while they finish. Expected latencies come
+from a model learned online from completed calls, optionally warmed up from
+the trace of an earlier run.
+"""
+import collections
+import json
+import time
+
+import numpy as np
+
+SCHEDULE_AGING = 1.0  # seconds of priority gained per second a question has been waiting
+LATENCY_EWMA_ALPHA = 0.2
+QUESTIONS_REMEMBERED = 4096
+
+
+class LatencyModel:
+    """
+    Expected call latency per (model, method): an exponentially weighted mean
+    of observed latencies. Methods not seen yet are predicted from a per-model
+    least-squares fit of latency on prompt tokens, or 0 with no data at all.
+    """
+
+    def __init__(self, alpha: float = LATENCY_EWMA_ALPHA):
+        self.alpha = alpha
+        self.means = {}
+        # per model: count, sum x, sum y, sum x^2, sum xy
+        self.fits = collections.defaultdict(lambda: np.zeros(5))
+
+    def observe(self, model: str, method: str, tokens: int, latency: float):
+        key = (model, method)
+        mean = self.means.get(key)
+        self.means[key] = latency if mean is None else mean + self.alpha * (latency - mean)
+        self.fits[model] += (1, tokens, latency, tokens * tokens, tokens * latency)
+
+    def predict(self, model: str, method: str, tokens: int) -> float:
+        mean = self.means.get((model, method))
+        if mean is not None:
+            return mean
+        n, sx, sy, sxx, sxy = self.fits[model]
+        if n == 0:
+            return 0.0
+        variance = n * sxx - sx * sx
+        if n < 2 or variance <= 0:
+            return sy / n
+        slope = (n * sxy - sx * sy) / variance
+        return max(0.0, (sy - slope * sx) / n + slope * tokens)
+
+    def load_trace(self, trace_path) -> int:
+        """Learns from the successful LLM calls of an earlier run's trace; returns how many."""
+        loaded = 0
+        with open(trace_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("kind") != "llm" or entry.get("error") or entry.get("cancelled") or entry.get("retries"):
+                    continue
+                if entry.get("prompt_tokens") is None:
+                    continue
+                self.observe(entry.get("model"), entry.get("method"), entry["prompt_tokens"], entry["latency"])
+                loaded += 1
+        return loaded
+
+
+class CallScheduler:
+    """
+    Gives each LLM call its rate limiter priority: longest expected latency
+    first, plus `aging` seconds of priority per second since the call's question
+    made its first call, so a question's short calls are not starved by the long
+    calls of newer questions. Disabled, every call gets the same priority and
+    calls are let in first come, first served.
+
+    It also keeps the predicted and actual latency of every call, and the
+    predicted and actual time at which the run's last calls finish.
+    """
+
+    def __init__(self, enabled: bool = False, aging: float = SCHEDULE_AGING, latency_model: LatencyModel = None):
+        self.enabled = enabled
+        self.aging = aging
+        self.latency_model = latency_model or LatencyModel()
+        self.question_started = collections.OrderedDict()
+        self.predicted = collections.defaultdict(float)
+        self.actual = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.first_dispatch = None
+        self.last_dispatch = None
+        self.predicted_end = None
+        self.last_end = None
+
+    def priority(self, model: str, method: str, question_id, tokens: int):
+        """
+        The rate limiter priority of a call about to queue: a function, so that
+        calls queued before their method's latency was known are ordered by what
+        has been learned by the time a slot frees up.
+        """
+        if not self.enabled:
+            return 0.0
+        started = self.question_started.setdefault(question_id, time.monotonic())
+        if len(self.question_started) > QUESTIONS_REMEMBERED:
+            self.question_started.popitem(last=False)
+        return lambda: self.aging * started - self.latency_model.predict(model, method, tokens)
+
+    def dispatched(self, model: str, method: str, tokens: int) -> float:
+        """Records a call leaving the queue; returns its predicted latency."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        predicted = self.latency_model.predict(model, method, tokens)
+        self.first_dispatch = self.first_dispatch or now
+        self.last_dispatch = now
+        self.predicted_end = max(self.predicted_end or now, now + predicted)
+        return predicted
+
+    def finished(self, model: str, method: str, tokens: int, predicted: float, latency: float):
+        if not self.enabled:
+            return
+        self.latency_model.observe(model, method, tokens, latency)
+        self.predicted[method] += predicted
+        self.actual[method] += latency
+        self.calls[method] += 1
+        self.last_end = time.monotonic()
+
+    def describe(self) -> str:
+        if self.first_dispatch is None or self.last_end is None:
+            return "no calls scheduled"
+        return (
+            f"last call dispatched at {self.last_dispatch - self.first_dispatch:.1f}s; "
+            f"predicted to finish at {self.predicted_end - self.first_dispatch:.1f}s, "
+            f"finished at {self.last_end - self.first_dispatch:.1f}s"
+        )
+
+    def print_summary(self):
+        print(f"Scheduling: longest expected first; {self.describe()}")
+        print(f"{'Method':<32}{'calls':>8}{'predicted s':>14}{'actual s':>12}")
+        for method in sorted(self.calls, key=lambda name: -self.actual[name] / self.calls[name]):
+            n = self.calls[method]
+            print(f"{str(method):<32}{n:>8}{self.predicted[method] / n:>14.2f}{self.actual[method] / n:>12.2f}")
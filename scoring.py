@@ -0,0 +1,241 @@
+"""
+Vectorized scoring over a (questions x methods) probability matrix.
+
+Rescores existing experiment outputs without any LLM calls:
+
+    python scoring.py outputs/binary_experiment_results_<timestamp>.json [...]
+"""
+import argparse
+import json
+import pathlib
+
+import numpy as np
+
+ENSEMBLE = "ENSEMBLE"
+EPSILON = 1e-6
+# File names inside a compact results store directory (see results_store.py)
+RESULTS_FILE = "results.jsonl"
+FORECASTS_FILE = "forecasts.npz"
+
+
+class ForecastMatrix:
+    """
+    Forecasts for one run: `forecasts[q, m]` is method m's probability for
+    question q (NaN if the method has no forecast), `outcomes[q]` is 0 or 1.
+    """
+
+    def __init__(self, question_ids: list, methods: list, forecasts: np.ndarray, outcomes: np.ndarray):
+        self.question_ids = question_ids
+        self.methods = methods
+        self.forecasts = forecasts
+        self.outcomes = outcomes
+
+    @classmethod
+    def from_results(cls, results, methods: list = None):
+        """Builds the matrix from an iterable of per-question result dicts."""
+        question_ids = []
+        rows = []
+        outcomes = []
+        seen = {}
+        for result in results:
+            question_ids.append(result["question_id"])
+            rows.append(result["individual_forecasts"])
+            outcomes.append(result["ground_truth"])
+            for name in result["individual_forecasts"]:
+                seen.setdefault(name, None)
+        if methods is None:
+            methods = list(seen)
+        forecasts = np.full((len(rows), len(methods)), np.nan)
+        column = {name: j for j, name in enumerate(methods)}
+        for i, row in enumerate(rows):
+            for name, prob in row.items():
+                if name in column and prob is not None:
+                    forecasts[i, column[name]] = prob
+        return cls(question_ids, methods, forecasts, np.asarray(outcomes, dtype=float))
+
+    @classmethod
+    def load(cls, path, methods: list = None):
+        """
+        Loads a final .json report, a .jsonl results log, a plain list of results,
+        a forecasts .npz or a compact results store directory.
+        """
+        path = pathlib.Path(path)
+        if path.is_dir():
+            npz_path = path / FORECASTS_FILE
+            if npz_path.exists():
+                return cls.load_npz(npz_path, methods)
+            path = path / RESULTS_FILE
+        if path.suffix == ".npz":
+            return cls.load_npz(path, methods)
+        return cls.from_results(iter_result_file(path), methods)
+
+    def save_npz(self, path):
+        """Saves the matrix alone, so analysis can load forecasts without any result text."""
+        np.savez_compressed(
+            path,
+            question_ids=np.array([json.dumps(question_id) for question_id in self.question_ids]),
+            methods=np.array(self.methods),
+            forecasts=self.forecasts,
+            outcomes=self.outcomes,
+        )
+
+    @classmethod
+    def load_npz(cls, path, methods: list = None):
+        with np.load(path) as data:
+            question_ids = [json.loads(question_id) for question_id in data["question_ids"]]
+            saved_methods = [str(name) for name in data["methods"]]
+            forecasts = data["forecasts"]
+            outcomes = data["outcomes"]
+        if methods is not None:
+            columns = {name: j for j, name in enumerate(saved_methods)}
+            selected = np.full((len(question_ids), len(methods)), np.nan)
+            for j, name in enumerate(methods):
+                if name in columns:
+                    selected[:, j] = forecasts[:, columns[name]]
+            forecasts, saved_methods = selected, list(methods)
+        return cls(question_ids, saved_methods, forecasts, outcomes)
+
+    def with_ensemble(self):
+        """Adds an ENSEMBLE column: the mean of the available method forecasts."""
+        ensemble = np.nanmean(self.forecasts, axis=1, keepdims=True)
+        return ForecastMatrix(
+            self.question_ids,
+            self.methods + [ENSEMBLE],
+            np.hstack([self.forecasts, ensemble]),
+            self.outcomes,
+        )
+
+
+def iter_result_file(path):
+    path = pathlib.Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    yield from report["results"] if isinstance(report, dict) else report
+
+
+def brier_scores(forecasts: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+    return (forecasts - outcomes[:, None]) ** 2
+
+
+def log_scores(forecasts: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+    """Natural-log likelihood of the outcome; higher is better, 0 is perfect."""
+    p = np.clip(forecasts, EPSILON, 1 - EPSILON)
+    y = outcomes[:, None]
+    return y * np.log(p) + (1 - y) * np.log(1 - p)
+
+
+def bin_indices(forecasts: np.ndarray, n_bins: int) -> np.ndarray:
+    return np.clip((np.nan_to_num(forecasts) * n_bins).astype(int), 0, n_bins - 1)
+
+
+def calibration_bins(forecasts: np.ndarray, outcomes: np.ndarray, n_bins: int = 10):
+    """
+    Per-method calibration table, each array shaped (n_bins, methods):
+    number of forecasts, mean forecast and observed frequency in each bin.
+    """
+    n_questions, n_methods = forecasts.shape
+    valid = ~np.isnan(forecasts)
+    # Offset each method's bins so one bincount covers every column
+    flat = (bin_indices(forecasts, n_bins) + np.arange(n_methods) * n_bins)[valid]
+    y = np.broadcast_to(outcomes[:, None], forecasts.shape)[valid]
+    size = n_bins * n_methods
+    counts = np.bincount(flat, minlength=size).reshape(n_methods, n_bins).T
+    forecast_sums = np.bincount(flat, weights=forecasts[valid], minlength=size).reshape(n_methods, n_bins).T
+    outcome_sums = np.bincount(flat, weights=y, minlength=size).reshape(n_methods, n_bins).T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return counts, forecast_sums / counts, outcome_sums / counts
+
+
+def murphy_decomposition(forecasts: np.ndarray, outcomes: np.ndarray, n_bins: int = 10):
+    """
+    Binned Brier decomposition per method: Brier ~= reliability - resolution + uncertainty.
+    Returns (reliability, resolution, uncertainty), each shaped (methods,).
+    """
+    counts, mean_forecast, observed = calibration_bins(forecasts, outcomes, n_bins)
+    n = counts.sum(axis=0)
+    valid = ~np.isnan(forecasts)
+    base_rate = (valid * outcomes[:, None]).sum(axis=0) / n
+    reliability = np.nansum(counts * (mean_forecast - observed) ** 2, axis=0) / n
+    resolution = np.nansum(counts * (observed - base_rate) ** 2, axis=0) / n
+    uncertainty = base_rate * (1 - base_rate)
+    return reliability, resolution, uncertainty
+
+
+def bootstrap_ci(scores: np.ndarray, n_resamples: int = 10000, confidence: float = 0.95, seed: int = 0, chunk_size: int = 1000):
+    """
+    Percentile bootstrap CI of the per-column mean of a (questions x methods) score matrix.
+    Resamples are drawn as multinomial question weights, so each chunk is one matrix product.
+    Returns (low, high), each shaped (methods,).
+    """
+    rng = np.random.default_rng(seed)
+    n_questions = scores.shape[0]
+    valid = ~np.isnan(scores)
+    filled = np.where(valid, scores, 0.0)
+    means = []
+    for start in range(0, n_resamples, chunk_size):
+        size = min(chunk_size, n_resamples - start)
+        weights = rng.multinomial(n_questions, np.full(n_questions, 1 / n_questions), size=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means.append((weights @ filled) / (weights @ valid))
+    means = np.vstack(means)
+    alpha = (1 - confidence) / 2
+    return np.nanquantile(means, alpha, axis=0), np.nanquantile(means, 1 - alpha, axis=0)
+
+
+def score_summary(matrix: ForecastMatrix, n_bins: int = 10, n_resamples: int = 10000, confidence: float = 0.95):
+    """Summary statistics per method, ranked by mean Brier score."""
+    briers = brier_scores(matrix.forecasts, matrix.outcomes)
+    mean_brier = np.nanmean(briers, axis=0)
+    mean_log = np.nanmean(log_scores(matrix.forecasts, matrix.outcomes), axis=0)
+    reliability, resolution, uncertainty = murphy_decomposition(matrix.forecasts, matrix.outcomes, n_bins)
+    low, high = bootstrap_ci(briers, n_resamples, confidence)
+    rows = [
+        {
+            "name": name,
+            "brier": float(mean_brier[j]),
+            "brier_ci": [float(low[j]), float(high[j])],
+            "log_score": float(mean_log[j]),
+            "reliability": float(reliability[j]),
+            "resolution": float(resolution[j]),
+            "uncertainty": float(uncertainty[j]),
+            "n": int((~np.isnan(matrix.forecasts[:, j])).sum()),
+        }
+        for j, name in enumerate(matrix.methods)
+    ]
+    return sorted(rows, key=lambda row: row["brier"])
+
+
+def print_summary(path, rows: list, confidence: float):
+    print(f"\n{path}")
+    print(f"{'method':<26}{'n':>5}{'brier':>9}{int(confidence * 100):>5}% CI{'':>10}{'log':>9}{'rel':>8}{'res':>8}{'unc':>8}")
+    for row in rows:
+        low, high = row["brier_ci"]
+        print(
+            f"{row['name']:<26}{row['n']:>5}{row['brier']:>9.4f}  [{low:.4f}, {high:.4f}]"
+            f"{row['log_score']:>9.4f}{row['reliability']:>8.4f}{row['resolution']:>8.4f}{row['uncertainty']:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore experiment result files without any LLM calls.")
+    parser.add_argument("paths", nargs="+", help="final .json reports, .jsonl results logs, .npz forecasts or result stores")
+    parser.add_argument("--bins", type=int, default=10, help="calibration bins")
+    parser.add_argument("--resamples", type=int, default=10000, help="bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="bootstrap confidence level")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    args = parser.parse_args()
+
+    summaries = {}
+    for path in args.paths:
+        matrix = ForecastMatrix.load(path).with_ensemble()
+        summaries[path] = score_summary(matrix, args.bins, args.resamples, args.confidence)
+        if not args.json:
+            print_summary(path, summaries[path], args.confidence)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
@@ -0,0 +1,195 @@
+"""
+Sharded runs across processes or hosts, and a deterministic merge of their logs.
+
+Run N local worker processes, each with its own rate budget and results log,
+then merge them:
+
+    python shards.py run --workers 4 --key-env OPENAI_KEY_A,OPENAI_KEY_B -- --rpm 2000 [dataset filters]
+
+On several hosts, run one shard per host and merge the copied logs:
+
+    host1$ python binary_test_system.py --shard 1/2 --output shard-1-of-2.jsonl
+    host2$ python binary_test_system.py --shard 2/2 --output shard-2-of-2.jsonl
+    python shards.py merge shard-*.jsonl --out merged.jsonl --file <dataset>
+
+Shards written as compact results stores (--compact) are expanded as they are merged.
+
+Questions are assigned to shards by a stable hash of the question ID
+(question_loader.question_shard), so every host agrees on the partition.
+"""
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import binary_test_system as bts
+from question_loader import load_questions
+from results_log import ResultsLog
+from results_store import ResultsStore
+
+HERE = pathlib.Path(__file__).resolve().parent
+
+
+def merge_shards(shard_paths: list, merged_path, question_order: list = None):
+    """
+    Combines shard logs into one results log, in dataset order when
+    `question_order` is given and by question ID otherwise. Raises ValueError
+    if a question appears in more than one shard or, given the dataset order,
+    if a question is missing or unexpected. Returns (merged_log, question_order, method_names).
+    """
+    logs = [ResultsStore(path) if pathlib.Path(path).is_dir() else ResultsLog(path) for path in shard_paths]
+    located = {}
+    duplicates = {}
+    method_names = []
+    for index, path in enumerate(shard_paths):
+        latest = {}  # a question retried within one shard keeps its latest record
+        for offset, result in logs[index].iter_offsets():
+            latest[result["question_id"]] = offset
+            for name in [*result["individual_forecasts"], *result.get("missing_methods", {})]:
+                if name not in method_names:
+                    method_names.append(name)
+        for question_id, offset in latest.items():
+            if question_id in located:
+                duplicates.setdefault(question_id, [str(shard_paths[located[question_id][0]])]).append(str(path))
+            located[question_id] = (index, offset)
+
+    problems = []
+    if duplicates:
+        problems.append(f"{len(duplicates)} questions appear in more than one shard, e.g. "
+                        + ", ".join(f"{qid} in {paths}" for qid, paths in list(duplicates.items())[:5]))
+    if question_order is not None:
+        expected = set(question_order)
+        missing = [qid for qid in question_order if qid not in located]
+        unexpected = [qid for qid in located if qid not in expected]
+        if missing:
+            problems.append(f"{len(missing)} questions are missing from every shard, e.g. {missing[:10]}")
+        if unexpected:
+            problems.append(f"{len(unexpected)} questions are not in the dataset, e.g. {unexpected[:10]}")
+    else:
+        question_order = sorted(located, key=str)
+    if problems:
+        raise ValueError("; ".join(problems))
+
+    # Records are copied byte for byte, so merging never re-serializes results,
+    # except that compact store records are expanded back into full results
+    merged_log = ResultsLog(merged_path)
+    merged_log.path.parent.mkdir(parents=True, exist_ok=True)
+    files = [open(log.path, "rb") for log in logs]
+    try:
+        with open(merged_log.path, "wb") as out:
+            for question_id in question_order:
+                index, offset = located[question_id]
+                files[index].seek(offset)
+                line = files[index].readline()
+                if isinstance(logs[index], ResultsStore):
+                    line = (json.dumps(logs[index].expand(json.loads(line))) + "\n").encode("utf-8")
+                out.write(line)
+    finally:
+        for f in files:
+            f.close()
+        for log in logs:
+            log.close()
+    return merged_log, question_order, method_names
+
+
+def report_method_names(seen: list) -> list:
+    """BINARY_REASONING_PROMPTS order for the standard methods, then any others (e.g. sweep pairs) sorted."""
+    standard = [name for name, _ in bts.BINARY_REASONING_PROMPTS if name in seen]
+    return standard + sorted(name for name in seen if name not in standard)
+
+
+def merge_main(shard_paths: list, merged_path, dataset: str = None, question_filters: dict = None):
+    question_order = None
+    if dataset:
+        filters = {**(question_filters or {}), "shard": None}
+        question_order = [q["id"] for q in load_questions(dataset, **filters)]
+    merged_log, question_order, seen = merge_shards(shard_paths, merged_path, question_order)
+    sorted_scores, mean_ensemble_brier = bts.write_final_report(
+        merged_log, merged_log.path.with_suffix(".json"), question_order, method_names=report_method_names(seen)
+    )
+    print(f"Merged {len(question_order)} questions from {len(shard_paths)} shards into {merged_log.path}")
+    print(f"Report written to {merged_log.path.with_suffix('.json')}")
+    print("\nMean Brier Scores (ranked):")
+    for rank, (name, score) in enumerate(sorted_scores, 1):
+        print(f"{rank}. {name}: {bts.format_brier(score)}")
+    print(f"\nEnsemble Mean Brier: {bts.format_brier(mean_ensemble_brier)}")
+
+
+def run_workers(n_workers: int, shard_dir: pathlib.Path, worker_args: list, key_envs: list = None) -> list:
+    """
+    Starts one binary_test_system process per shard and waits for all of them.
+    Worker k uses the API key in the k-th of `key_envs` (cycled), if given.
+    Returns the shard log paths.
+    """
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Shard logs in {shard_dir}; rerun with --shard-dir {shard_dir} to resume an interrupted run")
+    suffix = ".store" if "--compact" in worker_args else ".jsonl"
+    workers = []
+    for k in range(1, n_workers + 1):
+        log_path = shard_dir / f"shard-{k}-of-{n_workers}{suffix}"
+        env = dict(os.environ)
+        if key_envs:
+            key_env = key_envs[(k - 1) % len(key_envs)]
+            if not os.getenv(key_env):
+                raise ValueError(f"{key_env} is not set")
+            env["OPENAI_API_KEY"] = os.environ[key_env]
+        stdout = open(shard_dir / f"shard-{k}-of-{n_workers}.out", "a", encoding="utf-8")
+        process = subprocess.Popen(
+            [sys.executable, str(HERE / "binary_test_system.py"),
+             "--shard", f"{k}/{n_workers}", "--output", str(log_path), *worker_args],
+            env=env, stdout=stdout, stderr=subprocess.STDOUT,
+        )
+        workers.append((k, process, stdout, log_path))
+        print(f"Started shard {k}/{n_workers} (pid {process.pid}), output in {stdout.name}")
+
+    failed = []
+    for k, process, stdout, _ in workers:
+        if process.wait() != 0:
+            failed.append(k)
+        stdout.close()
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed; rerun with --shard-dir {shard_dir} to resume them")
+    return [log_path for _, _, _, log_path in workers]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the experiment in shards and merge the shard results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run local worker processes, one per shard, then merge")
+    run_parser.add_argument("--workers", type=int, required=True, help="number of shards / processes")
+    run_parser.add_argument("--shard-dir", help="directory for shard logs; reuse it to resume an interrupted run")
+    run_parser.add_argument("--key-env", type=lambda value: value.split(","),
+                            help="comma-separated env vars holding API keys, assigned to workers in turn")
+    run_parser.add_argument("worker_args", nargs=argparse.REMAINDER,
+                            help="arguments after -- are passed to every binary_test_system worker")
+
+    merge_parser = commands.add_parser("merge", help="merge shard results logs into one log and report")
+    merge_parser.add_argument("shards", nargs="+", help="shard results logs (.jsonl) or results stores")
+    merge_parser.add_argument("--out", required=True, help="merged results log; the report is written next to it")
+    merge_parser.add_argument("--file", help="dataset to check coverage against; questions are ordered as in it")
+    merge_parser.add_argument("--ids", type=lambda value: value.split(","),
+                              help="comma-separated question IDs the shards were run with")
+    merge_parser.add_argument("--opened-after", metavar="DATE")
+    merge_parser.add_argument("--opened-before", metavar="DATE")
+    merge_parser.add_argument("--tags", type=lambda value: value.split(","))
+    args = parser.parse_args()
+
+    try:
+        if args.command == "run":
+            worker_args = args.worker_args[1:] if args.worker_args[:1] == ["--"] else args.worker_args
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            shard_dir = pathlib.Path(args.shard_dir or f"outputs/shards_{timestamp}")
+            shard_paths = run_workers(args.workers, shard_dir, worker_args, args.key_env)
+            worker_parser = argparse.ArgumentParser(add_help=False)
+            bts.add_dataset_arguments(worker_parser)
+            dataset_args, _ = worker_parser.parse_known_args(worker_args)
+            merge_main(shard_paths, shard_dir / "merged.jsonl", dataset_args.file, bts.question_filters_from_args(dataset_args))
+        else:
+            filters = {"ids": args.ids, "opened_after": args.opened_after, "opened_before": args.opened_before, "tags": args.tags}
+            merge_main(args.shards, args.out, args.file, filters)
+    except (RuntimeError, ValueError) as e:
+        sys.exit(f"Error: {e}")
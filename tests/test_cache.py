@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from cache import CacheMiss, ComputeCancelled, SQLiteCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_concurrent_callers_share_one_compute(cache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute("key", compute) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert calls == 1
+    assert cache.get("key") == "value" and cache._in_flight == {}
+
+
+def test_compute_error_reaches_every_caller_and_is_not_cached(cache):
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute("key", compute) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache.get("key") is None and cache._in_flight == {}
+
+
+def test_cancelled_owner_fails_waiters_with_compute_cancelled(cache):
+    async def compute():
+        await asyncio.sleep(10)
+
+    async def main():
+        owner = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        with pytest.raises(ComputeCancelled):
+            await waiter
+        # The next caller computes afresh
+        async def retry():
+            return "value"
+        return await cache.get_or_compute("key", retry)
+
+    assert asyncio.run(main()) == "value"
+
+
+def test_cancelled_waiter_does_not_cancel_the_owner(cache):
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        owner = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(main()) == "value"
+
+
+@pytest.mark.parametrize("mode, reads, writes", [
+    ("read_write", True, True),
+    ("record", False, True),
+    ("replay", True, False),
+    ("bypass", False, False),
+])
+def test_modes(cache, mode, reads, writes):
+    cache.mode = "read_write"
+    cache.put("stored", "old")
+    cache.mode = mode
+    assert (cache.reads, cache.writes) == (reads, writes)
+    assert asyncio.run(cache.get_or_compute("stored", _value("new"))) == ("old" if reads else "new")
+    if mode == "replay":
+        with pytest.raises(CacheMiss):
+            asyncio.run(cache.get_or_compute("missing", _value("new")))
+    cache.mode = "read_write"
+    assert cache.get("stored") == ("new" if writes and not reads else "old")
+
+
+def test_unknown_mode_is_rejected(cache):
+    with pytest.raises(ValueError, match="Unknown cache mode"):
+        cache.mode = "sometimes"
+
+
+def test_eviction_keeps_the_newest_entries(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite", max_entries=3)
+    for i in range(10):
+        cache.put(f"key {i}", str(i))
+    cache.evict()
+    assert [cache.get(f"key {i}") for i in range(10)].count(None) == 7
+    assert cache.get("key 9") == "9"
+    cache.close()
+
+
+def test_keys_depend_on_every_part():
+    assert SQLiteCache.make_key("model", 0.3, "prompt") == SQLiteCache.make_key("model", 0.3, "prompt")
+    assert SQLiteCache.make_key("model", 0.3, "prompt") != SQLiteCache.make_key("model", 0.3, "prompt", 2)
+
+
+def _value(value):
+    async def compute():
+        return value
+    return compute
@@ -0,0 +1,31 @@
+import json
+import math
+
+import numpy as np
+
+from compare import holm, permutation_p_values, stream_results
+
+
+def test_holm_adjusts_in_order_and_keeps_nan_out():
+    assert holm([0.01, 0.04, 0.03]) == [0.03, 0.06, 0.06]
+    adjusted = holm([float("nan"), 0.001, 0.002])
+    assert math.isnan(adjusted[0]) and adjusted[1:] == [0.002, 0.002]
+    assert holm([]) == []
+
+
+def test_permutation_p_values():
+    rng = np.random.default_rng(1)
+    shifted = rng.normal(0.5, 0.1, 30)
+    centred = rng.normal(0.0, 0.1, 30)
+    p_shifted, p_centred, p_empty = permutation_p_values([shifted, centred, np.array([])], n_resamples=2000)
+    assert p_shifted < 0.01 < p_centred
+    assert math.isnan(p_empty)
+
+
+def test_stream_results_reads_the_summary_after_the_results(tmp_path):
+    results = [{"question_id": i, "individual_forecasts": {"A": 0.5}} for i in range(3)]
+    path = tmp_path / "run.json"
+    path.write_text(json.dumps({"prompt_template_used": "T", "results": results, "summary": {"model": "m"}}))
+    metadata = {}
+    assert list(stream_results(path, metadata)) == results
+    assert metadata["summary"] == {"model": "m"}
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import pytest
+
+from hedging import Hedger
+
+FAST = 0.01
+SLOW = 1.0
+
+
+def scripted(*calls):
+    """A make_call whose n-th call waits `queued` seconds unsent, then is sent and answers after `latency`."""
+    calls = iter(calls)
+    started = []
+
+    def make_call(on_sent):
+        latency, queued, answer = next(calls)
+        started.append(answer)
+
+        async def call():
+            await asyncio.sleep(queued)
+            on_sent(time.perf_counter())
+            try:
+                await asyncio.sleep(latency)
+                if isinstance(answer, Exception):
+                    raise answer
+                return answer
+            finally:
+                on_sent(None)
+
+        return call()
+
+    return make_call, started
+
+
+def call(latency, answer="answer", queued=0.0):
+    return latency, queued, answer
+
+
+async def warm_up(hedger, n):
+    for _ in range(n):
+        make_call, _ = scripted(call(FAST))
+        await hedger.run("model", make_call)
+
+
+def test_disabled_never_hedges():
+    async def main():
+        hedger = Hedger(enabled=False, min_samples=2)
+        await warm_up(hedger, 3)
+        make_call, started = scripted(call(0.1), call(FAST))
+        assert await hedger.run("model", make_call) == "answer"
+        return hedger, started
+
+    hedger, started = asyncio.run(main())
+    assert hedger.hedges == 0 and len(started) == 1
+
+
+def test_no_hedging_before_the_latency_model_is_warm():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=5)
+        await warm_up(hedger, 4)
+        make_call, started = scripted(call(0.1), call(FAST))
+        await hedger.run("model", make_call)
+        return hedger, started
+
+    hedger, started = asyncio.run(main())
+    assert hedger.hedges == 0 and len(started) == 1
+
+
+def test_slow_call_is_hedged_and_the_backup_wins():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        make_call, started = scripted(call(SLOW, "primary"), call(FAST, "backup"))
+        started_at = time.perf_counter()
+        answer = await hedger.run("model", make_call)
+        return hedger, answer, time.perf_counter() - started_at, started
+
+    hedger, answer, elapsed, started = asyncio.run(main())
+    assert answer == "backup" and elapsed < SLOW / 2
+    assert started == ["primary", "backup"]
+    assert (hedger.hedges, hedger.hedge_wins, hedger.hedges_unsent) == (1, 1, 0)
+
+
+def test_hedged_primary_latency_is_learned():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        delay = hedger.hedge_delay("model")
+        make_call, _ = scripted(call(SLOW, "primary"), call(FAST, "backup"))
+        await hedger.run("model", make_call)
+        return hedger, delay
+
+    hedger, delay = asyncio.run(main())
+    latencies = list(hedger.latencies["model"])
+    assert len(latencies) == 4
+    # Cancelled after losing: learned as a lower bound above the hedge delay, so the tail is kept
+    assert latencies[-1] > delay
+
+
+def test_time_queued_before_sending_is_not_hedged():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        make_call, started = scripted(call(FAST, queued=0.2), call(FAST))
+        await hedger.run("model", make_call)
+        return hedger, started
+
+    hedger, started = asyncio.run(main())
+    assert hedger.hedges == 0 and len(started) == 1
+
+
+def test_budget_limits_hedges():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=0.0)
+        await warm_up(hedger, 3)
+        make_call, started = scripted(call(0.1, "primary"), call(FAST, "backup"))
+        answer = await hedger.run("model", make_call)
+        return hedger, answer, started
+
+    hedger, answer, started = asyncio.run(main())
+    assert answer == "primary" and hedger.hedges == 0 and len(started) == 1
+
+
+def test_backup_cancelled_before_sending_costs_nothing():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        make_call, _ = scripted(call(0.1, "primary"), call(FAST, "backup", queued=SLOW))
+        answer = await hedger.run("model", make_call)
+        return hedger, answer
+
+    hedger, answer = asyncio.run(main())
+    assert answer == "primary"
+    assert (hedger.hedges, hedger.hedges_unsent, hedger.hedge_wins) == (1, 1, 0)
+
+
+def test_failed_backup_leaves_the_primary_to_answer():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        make_call, _ = scripted(call(0.1, "primary"), call(FAST, ValueError("backup failed")))
+        return await hedger.run("model", make_call)
+
+    assert asyncio.run(main()) == "primary"
+
+
+def test_both_failing_raises_the_primary_error():
+    async def main():
+        hedger = Hedger(enabled=True, min_samples=3, max_fraction=1.0)
+        await warm_up(hedger, 3)
+        make_call, _ = scripted(call(0.1, ValueError("primary failed")), call(FAST, ValueError("backup failed")))
+        await hedger.run("model", make_call)
+
+    with pytest.raises(ValueError, match="primary failed"):
+        asyncio.run(main())
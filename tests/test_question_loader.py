@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+import question_loader
+from question_loader import iter_json_array, load_questions
+
+
+@pytest.fixture(params=[1, 2, 3, 7, 1 << 16])
+def chunk_size(request, monkeypatch):
+    monkeypatch.setattr(question_loader, "READ_CHUNK_SIZE", request.param)
+    return request.param
+
+
+def test_array_elements_across_chunk_boundaries(chunk_size):
+    values = [0.5, 1e-07, -2.5e10, 12345, -0.0, True, None, "a, ]b", [1.5e-3, 2], {"k": [0.25]}]
+    assert list(iter_json_array(io.StringIO(json.dumps(values)))) == values
+
+
+def test_whitespace_and_empty_array(chunk_size):
+    assert list(iter_json_array(io.StringIO(" \n [ \n ] "))) == []
+    assert list(iter_json_array(io.StringIO("[ 1 ,\n 2 ]"))) == [1, 2]
+
+
+def test_path_or_file(tmp_path, chunk_size):
+    path = tmp_path / "values.json"
+    path.write_text(json.dumps([{"id": 1}, {"id": 2}]), encoding="utf-8")
+    assert list(iter_json_array(path)) == [{"id": 1}, {"id": 2}]
+    with open(path, "r", encoding="utf-8") as f:
+        assert list(iter_json_array(f)) == [{"id": 1}, {"id": 2}]
+
+
+def test_keyed_array_collects_members_before_and_after(chunk_size):
+    report = {"prompt_template_used": "T", "results": [{"q": 1}, {"q": 2}], "summary": {"mean": 0.125}}
+    members = {}
+    assert list(iter_json_array(io.StringIO(json.dumps(report)), key="results", members=members)) == report["results"]
+    assert members == {"prompt_template_used": "T", "summary": {"mean": 0.125}}
+
+
+def test_keyed_array_missing(chunk_size):
+    with pytest.raises(ValueError, match="no results list"):
+        list(iter_json_array(io.StringIO('{"summary": {}}'), key="results"))
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError, match="does not contain a JSON array"):
+        list(iter_json_array(io.StringIO('{"results": []}')))
+
+
+def test_truncated_array(chunk_size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"b"')))
+
+
+def test_load_questions_filters_json_and_jsonl(tmp_path):
+    questions = [
+        {"id": 1, "resolution": "yes", "open_time": "2024-01-05T00:00:00Z", "tags": [{"slug": "AI"}]},
+        {"id": 2, "resolution": "annulled", "open_time": "2024-01-05T00:00:00Z"},
+        {"id": 3, "resolution": "No", "open_time": "2023-06-01T00:00:00Z", "tags": ["economy"]},
+    ]
+    array_path = tmp_path / "questions.json"
+    array_path.write_text(json.dumps(questions), encoding="utf-8")
+    lines_path = tmp_path / "questions.jsonl"
+    lines_path.write_text("\n".join(json.dumps(q) for q in questions) + "\n", encoding="utf-8")
+    for path in (array_path, lines_path):
+        assert [q["id"] for q in load_questions(path)] == [1, 3]
+        assert [q["id"] for q in load_questions(path, tags=["ai"])] == [1]
+        assert [q["id"] for q in load_questions(path, opened_after="2024-01-01")] == [1]
+        assert [q["id"] for q in load_questions(path, ids=["3"])] == [3]
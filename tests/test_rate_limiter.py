@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import BACKOFF_FACTOR, AdaptiveRateLimiter, TokenBucket, parse_duration
+
+
+def unlimited(max_concurrency: int) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(max_concurrency, requests_per_minute=1e9, tokens_per_minute=1e12)
+
+
+async def hold(limiter: AdaptiveRateLimiter):
+    """Enters a slot and returns its context manager, to be exited by the test."""
+    slot = limiter.slot(1)
+    await slot.__aenter__()
+    return slot
+
+
+def test_slots_are_handed_out_by_priority_then_arrival():
+    async def main():
+        limiter = unlimited(1)
+        holder = await hold(limiter)
+        order = []
+
+        async def call(name, priority):
+            async with limiter.slot(1, priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(call(name, priority))
+            for name, priority in [("late", 3), ("first", 1), ("second a", 2), ("second b", 2), ("dynamic", lambda: 0)]
+        ]
+        await asyncio.sleep(0)
+        await holder.__aexit__(None, None, None)
+        await asyncio.gather(*tasks)
+        return order, limiter
+
+    order, limiter = asyncio.run(main())
+    assert order == ["dynamic", "first", "second a", "second b", "late"]
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0 and limiter._free_slots == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = unlimited(1)
+        holder = await hold(limiter)
+        waiter = asyncio.ensure_future(hold(limiter))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter._waiters == [] and limiter.queue_depth == 0
+        await holder.__aexit__(None, None, None)
+        return limiter
+
+    assert asyncio.run(main())._free_slots == 1
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    async def main():
+        limiter = unlimited(1)
+        holder = await hold(limiter)
+        first = asyncio.ensure_future(hold(limiter))
+        second = asyncio.ensure_future(hold(limiter))
+        await asyncio.sleep(0)
+        await holder.__aexit__(None, None, None)  # hands the slot to `first`...
+        first.cancel()  # ...which is cancelled before it runs
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        slot = await asyncio.wait_for(second, 1)
+        assert limiter.in_flight == 1
+        await slot.__aexit__(None, None, None)
+        return limiter
+
+    limiter = asyncio.run(main())
+    assert limiter._free_slots == 1 and limiter.in_flight == 0
+
+
+def test_concurrency_is_bounded():
+    async def main():
+        limiter = unlimited(3)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter.slot(1):
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*[call() for _ in range(20)])
+        return peak, limiter
+
+    peak, limiter = asyncio.run(main())
+    assert peak == 3 and limiter._free_slots == 3
+
+
+def test_a_burst_of_429s_cuts_the_budget_once():
+    limiter = AdaptiveRateLimiter(4, requests_per_minute=1000, tokens_per_minute=100_000)
+    assert limiter.on_rate_limited({"retry-after-ms": "250"}) == 0.25
+    assert limiter.on_rate_limited({"retry-after": "1s"}) == 1.0
+    assert limiter.requests.capacity == pytest.approx(1000 * BACKOFF_FACTOR)
+    assert limiter.tokens.capacity == pytest.approx(100_000 * BACKOFF_FACTOR)
+    assert limiter.rate_limited == 2
+
+
+def test_429_waits_for_the_exhausted_budget_to_reset():
+    limiter = AdaptiveRateLimiter(4)
+    headers = {
+        "x-ratelimit-remaining-requests": "5",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-reset-tokens": "6m0s",
+    }
+    assert limiter.on_rate_limited(headers) == 360
+
+
+def test_headers_set_the_ceiling_and_remaining_budget():
+    limiter = AdaptiveRateLimiter(4, requests_per_minute=100, tokens_per_minute=1000)
+    limiter.update_from_headers({
+        "x-ratelimit-limit-requests": "200",
+        "x-ratelimit-limit-tokens": "2000",
+        "x-ratelimit-remaining-requests": "3",
+    })
+    assert limiter.requests_ceiling == pytest.approx(190)
+    assert limiter.requests.level <= 3
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3.5s") == pytest.approx(3723.5)
+    assert parse_duration("0.5") == 0.5
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+
+def test_oversized_request_waits_for_a_full_bucket_not_forever():
+    bucket = TokenBucket(60)
+    bucket.level = 0
+    assert bucket.wait_time(1000) == pytest.approx(60, rel=0.01)